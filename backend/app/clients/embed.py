@@ -4,9 +4,63 @@ from torch import Tensor
 from transformers import AutoTokenizer, AutoModel
 import json
 import os
+import threading
+from functools import lru_cache
 import numpy as np
 from typing import List, Dict, Any, Tuple
-from app.db.database import get_all_cases
+from app.db.database import (
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    get_all_cases,
+    get_case_by_id,
+    get_embeddings,
+    get_similarity_index,
+)
+from app.db.embedding_cache import EmbeddingCache
+
+MODEL_NAME = "intfloat/multilingual-e5-large"
+
+
+class EmbeddingModel:
+    """
+    Process-wide holder for the e5 tokenizer and model.
+
+    The model is loaded lazily on first use (or explicitly via warm_up at
+    startup) and then reused by every request. Loading is guarded by a lock
+    so concurrent first requests only load it once, and forward passes are
+    serialized because the model is shared between threads.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._load_lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+        self._loaded = None
+
+    def get(self) -> Tuple[Any, Any, torch.device]:
+        """Get (tokenizer, model, device), loading them on first use"""
+        if self._loaded is None:
+            with self._load_lock:
+                if self._loaded is None:
+                    # Use MPS (Metal Performance Shaders) if available, otherwise use CPU or CUDA
+                    device = torch.device("cuda" if torch.cuda.is_available() else
+                                         "mps" if torch.backends.mps.is_available() else "cpu")
+                    print(f"Loading embedding model {self.model_name} on {device}")
+                    tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    model = AutoModel.from_pretrained(self.model_name).to(device)
+                    model.eval()
+                    self._loaded = (tokenizer, model, device)
+        return self._loaded
+
+
+embedding_model = EmbeddingModel(MODEL_NAME)
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+
+
+def warm_up():
+    """Load the embedding model ahead of the first request"""
+    embedding_model.get()
+
 
 def average_pool(last_hidden_states: Tensor, attention_mask: Tensor) -> Tensor:
     last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
@@ -24,67 +78,47 @@ def find_similar(query_case: Dict[str, Any], threshold: float = 0.5, top_k: int
     Returns:
         The query case with similar case IDs added
     """
-    # Get all cases
-    case_database = get_all_cases()
-    
+    embeddings = get_embeddings()
+
+    # Embed any stored case that doesn't have an embedding yet, once
+    missing = [case for case in get_all_cases() if case["id"] not in embeddings]
+    if missing:
+        vectors = embed_many(missing)
+        embeddings.put_many(zip([case["id"] for case in missing], vectors))
+
     # Get query embedding
     if "caseEmbedding" not in query_case:
         query_case = embed(query_case)
-    
-    query_embedding = query_case["caseEmbedding"]
-    query_embedding_tensor = torch.tensor(query_embedding)
-    
-    # Calculate similarity scores
-    similarities = []
-    for case in case_database:
-        # Skip the query case itself if it's in the database
-        if case.get("caseId") == query_case.get("caseId"):
-            continue
-            
-        # Add embedding to case if it doesn't have one
-        if "caseEmbedding" not in case:
-            case = embed(case)
-            
-        case_embedding = case["caseEmbedding"]
-        case_embedding_tensor = torch.tensor(case_embedding)
-        
-        # Calculate cosine similarity
-        similarity = torch.nn.functional.cosine_similarity(
-            query_embedding_tensor.unsqueeze(0), 
-            case_embedding_tensor.unsqueeze(0)
-        ).item()
-        
-        # Only include cases above the threshold
-        if similarity >= threshold:
-            similarities.append((case.get("caseId"), similarity))
-    
-    # Sort by similarity (highest first)
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    
-    # Get top k similar case IDs
-    similar_case_ids = [case_id for case_id, _ in similarities[:top_k]]
-    
+
+    # Exact matrix-vector product or approximate IVF search, depending on config
+    similarities = get_similarity_index().top_k(
+        query_case["caseEmbedding"],
+        k=top_k,
+        threshold=threshold,
+        exclude=[query_case.get("id")],
+    )
+    # Deleted cases keep their embedding row
+    similar_case_ids = [
+        case_id for case_id, _ in similarities if get_case_by_id(case_id) is not None
+    ]
+
     # Add similar case IDs to the query case
     query_case["similarCases"] = similar_case_ids
     
     return query_case
 
-def embed(case_data: Dict[str, Any]) -> Dict[str, Any]:
+def case_text(case_data: Dict[str, Any]) -> str:
     """
-    Add embedding to a case and return it
+    Build the text that represents a case for embedding
     
     Args:
-        case_data: The case data to embed
+        case_data: The case data to describe
         
     Returns:
-        The case data with embedding added
+        The e5 query text for the case
     """
-    # Use MPS (Metal Performance Shaders) if available, otherwise use CPU or CUDA
-    device = torch.device("cuda" if torch.cuda.is_available() else 
-                         "mps" if torch.backends.mps.is_available() else "cpu")
-    
-    # Extract case components
-    laws_affected = case_data.get("lawsAffected", [])
+    # Extract case components (stored cases use relevantLaws, older ones lawsAffected)
+    laws_affected = case_data.get("relevantLaws") or case_data.get("lawsAffected", [])
     plaintiff_arguments = case_data.get("plaintiffArgumentation", [])
     evidence_items = case_data.get("evidence", [])
     
@@ -97,28 +131,139 @@ def embed(case_data: Dict[str, Any]) -> Dict[str, Any]:
         evidence_text += f"{item.get('text', '')}; "
     
     # Combine all components into a single query text
-    case_text = f"query: {laws_text} {arguments_text} {evidence_text}"
+    return f"query: {laws_text} {arguments_text} {evidence_text}"
+
+def tokenize(texts: List[str]):
+    """Tokenize texts for the embedding model, truncated but not padded"""
+    tokenizer, _, _ = embedding_model.get()
+    return tokenizer(texts, max_length=512, truncation=True)
+
+def embed_tokenized(encoded, batch_size: int) -> np.ndarray:
+    """
+    Embed tokenized texts with batched forward passes
     
-    # Load the model and tokenizer
-    tokenizer = AutoTokenizer.from_pretrained('intfloat/multilingual-e5-large')
-    model = AutoModel.from_pretrained('intfloat/multilingual-e5-large').to(device)
+    Texts are sorted by token length, so each batch is padded only to the
+    length of its own longest text.
+    """
+    tokenizer, model, device = embedding_model.get()
+    rows = len(encoded["input_ids"])
+    embeddings = np.empty((rows, model.config.hidden_size), dtype=np.float32)
+    if not rows:
+        return embeddings
     
-    # Tokenize the input text
-    inputs = tokenizer([case_text], max_length=512, padding=True, truncation=True, return_tensors='pt')
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
     
-    # Generate embeddings
-    with torch.no_grad():
-        outputs = model(**inputs)
+    for start in range(0, len(order), batch_size):
+        batch_rows = order[start:start + batch_size]
+        batch = tokenizer.pad(
+            [{key: encoded[key][row] for key in encoded.keys()} for row in batch_rows],
+            return_tensors='pt',
+        )
+        inputs = {k: v.to(device) for k, v in batch.items()}
+        
+        # Generate embeddings
+        with embedding_model.inference_lock, torch.no_grad():
+            outputs = model(**inputs)
+        
+        # Average pool and normalize
+        batch_embeddings = average_pool(outputs.last_hidden_state, inputs["attention_mask"])
+        batch_embeddings = F.normalize(batch_embeddings, p=2, dim=1)
+        embeddings[batch_rows] = batch_embeddings.cpu().numpy()
     
-    # Average pool and normalize
-    embedding = average_pool(outputs.last_hidden_state, inputs["attention_mask"])
-    embedding = F.normalize(embedding, p=2, dim=1)
+    return embeddings
+
+class TextBatch:
+    """
+    Texts looked up in the embedding cache and tokenized, ready for the model
     
-    # Convert embedding to list for storage
-    embedding_list = embedding[0].cpu().numpy().tolist()
+    Creating a batch does everything but the forward passes, so callers can
+    prepare the next batch on another thread while the model runs.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.keys = [EmbeddingCache.key(MODEL_NAME, text) for text in texts]
+        self.vectors = embedding_cache.get_many(list(set(self.keys)))
+        # Only run the model on texts that aren't cached, each distinct text once
+        self.missing = {key: text for key, text in zip(self.keys, texts) if key not in self.vectors}
+        self.encoded = tokenize(list(self.missing.values())) if self.missing else None
+
+    @property
+    def tokens(self) -> int:
+        """Number of tokens the model has to run on"""
+        return sum(len(ids) for ids in self.encoded["input_ids"]) if self.encoded else 0
+
+    def embed(self, batch_size: int = 32) -> np.ndarray:
+        """
+        Run the model on the uncached texts
+        
+        Returns:
+            A float32 array of L2-normalized embeddings, one row per text in input order
+        """
+        if self.missing:
+            computed = embed_tokenized(self.encoded, batch_size)
+            fresh = list(zip(self.missing.keys(), computed))
+            embedding_cache.put_many(fresh)
+            self.vectors.update(fresh)
+        
+        if not self.keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([self.vectors[key] for key in self.keys]).astype(np.float32, copy=False)
+
+def embed_texts(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """
+    Embed many texts, skipping the model for texts embedded before
+    
+    Args:
+        texts: The texts to embed
+        batch_size: Number of texts per forward pass
+        
+    Returns:
+        A float32 array of L2-normalized embeddings, one row per text in input order
+    """
+    return TextBatch(texts).embed(batch_size)
+
+def embed_many(cases: List[Dict[str, Any]], batch_size: int = 32) -> np.ndarray:
+    """
+    Embed many cases at once
+    
+    Args:
+        cases: The cases to embed
+        batch_size: Number of cases per forward pass
+        
+    Returns:
+        A float32 array of embeddings, one row per case in input order
+    """
+    return embed_texts([case_text(case) for case in cases], batch_size=batch_size)
+
+@lru_cache(maxsize=1024)
+def embed_query(query: str) -> np.ndarray:
+    """
+    Embed a free-text search query
+    
+    Repeated queries are answered from an in-process LRU cache, and from the
+    persistent embedding cache after a restart, so they skip the model.
     
-    # Add embedding to case data
-    case_data["caseEmbedding"] = embedding_list
+    Args:
+        query: The search query
+        
+    Returns:
+        A read-only float32 L2-normalized embedding
+    """
+    embedding = embed_texts([f"query: {query.strip()}"])[0]
+    embedding.flags.writeable = False
+    return embedding
+
+def embed(case_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add embedding to a case and return it
+    
+    Args:
+        case_data: The case data to embed
+        
+    Returns:
+        The case data with embedding added
+    """
+    # Convert embedding to list for storage
+    case_data["caseEmbedding"] = embed_many([case_data])[0].tolist()
     
     return case_data
@@ -1,10 +1,9 @@
 import json
 from typing import List, Dict, Optional
 from pydantic import BaseModel, Field
-import requests
 from dotenv import load_dotenv
-import os
 import re
+from app.clients.llm import llm_client, message_content
 
 load_dotenv()
 
@@ -40,13 +39,7 @@ def call_azure_openai_analyzer(chunk):
     Returns:
         str: The structured case analysis in JSON format.
     """
-    # Azure OpenAI API configuration
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
-    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
-    
-    if not api_key or not endpoint:
+    if not llm_client.configured:
         raise ValueError("Azure OpenAI API key and endpoint must be set as environment variables")
     
     prompt = (
@@ -145,12 +138,6 @@ def call_azure_openai_analyzer(chunk):
     )
 
     try:
-        # Prepare the API request
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
-        }
-        
         # Azure OpenAI API request body
         request_body = {
             "messages": [
@@ -161,18 +148,11 @@ def call_azure_openai_analyzer(chunk):
             "response_format": {"type": "json_object"}
         }
         
-        # Make the API request to Azure OpenAI
-        response = requests.post(
-            f"{endpoint}",
-            headers=headers,
-            json=request_body
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        # Make the API request to Azure OpenAI over the shared connection pool
+        result = llm_client.chat(request_body)
         
         # Extract the generated content from Azure OpenAI response
-        generated_text = result["choices"][0]["message"]["content"]
+        generated_text = message_content(result)
         
         # Parse the JSON response
         try:
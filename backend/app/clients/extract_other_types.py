@@ -1,15 +1,29 @@
 import json
 import concurrent.futures
-import time
-import requests
-import os
 from dotenv import load_dotenv
 from typing import List, Dict, Optional, Any, Union
 from pydantic import BaseModel, Field
 from datetime import datetime  # Added import
+from app.clients.llm import llm_client, message_content
+from app.db.chunk_results import ChunkResultStore
+from app.db.database import get_chunk_results
 
 load_dotenv()
 
+# Version of the chunk prompt and response handling. Bump it when they
+# change, so chunk results stored by earlier versions are not reused.
+EXTRACTION_VERSION = "1"
+
+# Extra passes over the chunks that still failed after the client's retries
+CHUNK_SALVAGE_PASSES = 1
+
+# Characters per chunk sent to the LLM
+CHUNK_SIZE = 5000
+
+
+class ChunkExtractionError(Exception):
+    """The LLM response for a chunk could not be turned into case information"""
+
 
 class CaseInformation(BaseModel):
     Case_ID: Optional[str] = None
@@ -50,14 +64,12 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
 
     Returns:
         dict: The extracted case information from this chunk.
-    """
-    # Azure OpenAI API configuration
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
-    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
 
-    if not api_key or not endpoint:
+    Raises:
+        httpx.HTTPError: If the API call still failed after the client's retries.
+        ChunkExtractionError: If the response held no usable JSON object.
+    """
+    if not llm_client.configured:
         raise ValueError(
             "Azure OpenAI API key and endpoint must be set as environment variables"
         )
@@ -103,9 +115,6 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
     )
 
     try:
-        # Prepare the API request
-        headers = {"Content-Type": "application/json", "api-key": api_key}
-
         # Azure OpenAI API request body
         request_body = {
             "messages": [
@@ -119,19 +128,11 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
             "response_format": {"type": "json_object"},
         }
 
-        # Make the API request to Azure OpenAI
-        response = requests.post(
-            f"{endpoint}",
-            headers=headers,
-            json=request_body,
-            timeout=60,  # Add timeout to prevent hanging
-        )
-
-        response.raise_for_status()
-        result = response.json()
+        # Make the API request to Azure OpenAI over the shared connection pool
+        result = llm_client.chat(request_body)
 
         # Extract the generated content from Azure OpenAI response
-        response_text = result["choices"][0]["message"]["content"]
+        response_text = message_content(result)
 
         # Print the raw response for debugging problematic chunks
         if chunk_number == 1:
@@ -153,9 +154,6 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
                 dict_items = [item for item in response_json if isinstance(item, dict)]
                 if dict_items:
                     response_json = dict_items[0]  # Use the first dictionary
-                else:
-                    # Create an empty dictionary if no dictionaries found
-                    response_json = {}
 
         except json.JSONDecodeError:
             # If direct parsing fails, try to extract JSON from the text
@@ -165,12 +163,20 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
             if json_match:
                 try:
                     response_json = json.loads(json_match.group(1))
-                except:
-                    print(f"Failed to parse extracted JSON for chunk {chunk_number}")
-                    response_json = {}
+                except json.JSONDecodeError:
+                    llm_client.record_wasted(result)
+                    raise ChunkExtractionError(
+                        f"Failed to parse extracted JSON for chunk {chunk_number}"
+                    )
             else:
-                print(f"No JSON found in response for chunk {chunk_number}")
-                response_json = {}
+                llm_client.record_wasted(result)
+                raise ChunkExtractionError(f"No JSON found in response for chunk {chunk_number}")
+
+        if not isinstance(response_json, dict):
+            llm_client.record_wasted(result)
+            raise ChunkExtractionError(
+                f"API returned no JSON object for chunk {chunk_number} (size {chunk_size})"
+            )
 
         # Fix potential issues with the response format
         fixed_response = {}
@@ -215,8 +221,8 @@ def call_azure_openai_flashlight(chunk, chunk_number, chunk_size):
         print(
             f"An error occurred while calling Azure OpenAI for chunk {chunk_number} (size {chunk_size}): {e}"
         )
-        # Return a valid empty response
-        return {}
+        # No empty result, the caller records the chunk as failed so it is extracted again
+        raise
 
 
 def split_text_into_chunks(text, chunk_size=2000):
@@ -808,66 +814,112 @@ def process_chunk(args):
 
     Returns:
         dict: The extracted case information.
+
+    Raises:
+        httpx.HTTPError: If the LLM call still failed after the client's retries.
+        ChunkExtractionError: If the response held no usable JSON object.
     """
     chunk, chunk_number, chunk_size = args
-    try:
-        # Add a small delay to avoid overwhelming the API
-        if chunk_number > 1:
-            time.sleep(1)
-        return call_azure_openai_flashlight(chunk, chunk_number, chunk_size)
-    except Exception as e:
-        print(
-            f"Error in process_chunk for chunk {chunk_number} (size {chunk_size}): {e}"
-        )
-        return {}
+    # Pacing is left to the shared rate limiter of the LLM client
+    return call_azure_openai_flashlight(chunk, chunk_number, chunk_size)
 
 
-def process_with_chunk_size(text, chunk_size, max_workers=2):
+def run_chunks(chunk_args, max_workers, document, store):
     """
-    Process the text with a specific chunk size using parallel processing.
-    Using fewer workers to avoid overwhelming the API.
+    Process chunks in parallel and store each result or failure for the document.
 
     Args:
-        text (str): The text to process.
-        chunk_size (int): The chunk size to use.
+        chunk_args (list): (chunk, chunk_number, chunk_size) tuples.
         max_workers (int): Maximum number of parallel workers.
+        document (str): Key of the document in the chunk result store.
+        store (ChunkResultStore): Where results and failures are recorded.
 
     Returns:
-        dict: The merged case information from all chunks.
+        tuple: ({chunk_number: info} of the processed chunks, list of failed chunk args)
     """
-    chunks = split_text_into_chunks(text, chunk_size)
-    print(
-        f"Processing {len(chunks)} chunks of size {chunk_size} in parallel (max {max_workers} workers)..."
-    )
-
-    # Prepare arguments for parallel processing
-    chunk_args = [(chunk, i + 1, chunk_size) for i, chunk in enumerate(chunks)]
-
-    # Process chunks in parallel
-    all_chunk_info = []
+    results = {}
+    failed = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all tasks
-        future_to_chunk = {
-            executor.submit(process_chunk, arg): arg[1] for arg in chunk_args
-        }
+        future_to_chunk = {executor.submit(process_chunk, arg): arg for arg in chunk_args}
 
         # Collect results as they complete
         for future in concurrent.futures.as_completed(future_to_chunk):
-            chunk_number = future_to_chunk[future]
+            arg = future_to_chunk[future]
+            chunk_number, chunk_size = arg[1], arg[2]
             try:
-                chunk_info = future.result()
-                all_chunk_info.append(chunk_info)
-                print(
-                    f"Completed chunk {chunk_number}/{len(chunks)} (size {chunk_size})"
-                )
+                results[chunk_number] = future.result()
+                store.save(document, chunk_number, results[chunk_number])
+                print(f"Completed chunk {chunk_number} (size {chunk_size})")
             except Exception as e:
                 print(
                     f"Exception processing chunk {chunk_number} (size {chunk_size}): {e}"
                 )
-                all_chunk_info.append({})
+                store.fail(document, chunk_number, str(e))
+                failed.append(arg)
+    return results, failed
+
 
-    # Merge information from all chunks
-    merged_case_info = merge_case_information(all_chunk_info)
+def process_with_chunk_size(text, chunk_size, max_workers=None):
+    """
+    Process the text with a specific chunk size using parallel processing.
+    How many chunk calls are actually in flight is decided by the rate
+    limiter of the LLM client, which adapts to the quota of the endpoint.
+
+    Chunks of this document extracted by an earlier run are reused, so
+    only new and previously failed chunks are sent to the LLM. Chunks that
+    still fail after the client's retries get one more pass once the rest
+    of the document is done; if they fail again, the other chunks are merged
+    without them and they are recorded as failed for the next run, see
+    failed_chunks.
+
+    Args:
+        text (str): The text to process.
+        chunk_size (int): The chunk size to use.
+        max_workers (int): Maximum number of parallel workers, defaults to
+            the limiter's maximum concurrency.
+
+    Returns:
+        dict: The merged case information from all chunks.
+    """
+    chunks = split_text_into_chunks(text, chunk_size)
+    store = get_chunk_results()
+    document = ChunkResultStore.key(text, chunk_size, EXTRACTION_VERSION)
+    chunk_info = store.results(document)
+    if chunk_info:
+        print(f"Reusing {len(chunk_info)} of {len(chunks)} chunks extracted by an earlier run")
+
+    # Prepare arguments for parallel processing
+    pending = [
+        (chunk, i + 1, chunk_size)
+        for i, chunk in enumerate(chunks)
+        if i + 1 not in chunk_info
+    ]
+    if max_workers is None:
+        max_workers = llm_client.limiter.max_concurrency
+    max_workers = max(1, min(max_workers, len(pending)))
+    print(
+        f"Processing {len(pending)} chunks of size {chunk_size} in parallel (max {max_workers} workers)..."
+    )
+
+    for attempt in range(1 + CHUNK_SALVAGE_PASSES):
+        if not pending:
+            break
+        if attempt:
+            print(f"Retrying {len(pending)} failed chunks of size {chunk_size}")
+        results, pending = run_chunks(pending, max_workers, document, store)
+        chunk_info.update(results)
+
+    if pending:
+        print(
+            f"Chunks {sorted(arg[1] for arg in pending)} of size {chunk_size} failed, "
+            "merging the others without them"
+        )
+
+    # Merge information from all chunks, in document order
+    merged_case_info = merge_case_information(
+        [chunk_info[number] for number in sorted(chunk_info)]
+    )
     return merged_case_info
 
 
@@ -881,12 +933,7 @@ def extract_other_types(extracted_text: str) -> CaseInformation:
     Returns:
         CaseInformation: The structured case analysis.
     """
-    # Process the text with a specific chunk size
-    chunk_size = 5000
-    # Using fewer workers to avoid overwhelming the API
-    merged_case_info = process_with_chunk_size(
-        extracted_text, chunk_size, max_workers=2
-    )
+    merged_case_info = process_with_chunk_size(extracted_text, CHUNK_SIZE)
 
     print("merged_case_info")
     # Clean the response
@@ -896,3 +943,17 @@ def extract_other_types(extracted_text: str) -> CaseInformation:
     # Convert to CaseInformation model
     case_info = CaseInformation(**cleaned_response)
     return case_info
+
+
+def failed_chunks(extracted_text: str) -> List[int]:
+    """
+    Chunks of a text whose extraction failed in the last extract_other_types run.
+
+    Args:
+        extracted_text (str): The text that was extracted.
+
+    Returns:
+        list: Numbers of the failed chunks, empty if every chunk was extracted.
+    """
+    document = ChunkResultStore.key(extracted_text, CHUNK_SIZE, EXTRACTION_VERSION)
+    return get_chunk_results().failed(document)
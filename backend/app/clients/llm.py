@@ -0,0 +1,303 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from app.clients.rate_limit import RateLimiter, parse_retry_after
+
+load_dotenv()
+
+# Seconds to wait for a connection, and for a completion to arrive
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "120"))
+
+# Connections to the LLM endpoint, kept open between calls
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "10"))
+
+# Deployment quota, shared by all calls in the process
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("LLM_TOKENS_PER_MINUTE", "60000"))
+
+# Upper bound of the adaptive number of concurrent requests
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+
+# Tokens reserved for the completion of a request without max_tokens
+LLM_COMPLETION_TOKENS = int(os.environ.get("LLM_COMPLETION_TOKENS", "1000"))
+
+# Retries of a request that failed transiently, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "30"))
+
+# Response statuses worth retrying: timeouts, throttling and server errors
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Rough prompt size in characters per token, for estimates ahead of the call
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(request_body: Dict[str, Any]) -> int:
+    """Tokens a chat completions request is expected to use, prompt plus completion"""
+    prompt = sum(len(str(message.get("content", ""))) for message in request_body.get("messages", []))
+    completion = request_body.get("max_tokens") or LLM_COMPLETION_TOKENS
+    return prompt // CHARS_PER_TOKEN + completion
+
+
+def create_rate_limiter() -> RateLimiter:
+    """A rate limiter for the configured quota"""
+    return RateLimiter(
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+    )
+
+
+def retry_delay(attempt: int, base: float = LLM_RETRY_BASE_DELAY, cap: float = LLM_RETRY_MAX_DELAY) -> float:
+    """Seconds to wait before retry number attempt (from 1), with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in TRANSIENT_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+class LLMMetrics:
+    """Counters of the LLM calls of a client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.tokens_used = 0
+        self.tokens_wasted = 0
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "tokensUsed": self.tokens_used,
+                "tokensWasted": self.tokens_wasted,
+            }
+
+
+class LLMClient:
+    """
+    Shared HTTP client for the Azure OpenAI chat completions endpoint.
+
+    All extractors post through one pooled httpx client, so calls reuse
+    kept-alive connections instead of paying a TLS handshake each. Endpoint
+    and API key default to AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY,
+    read at call time; pass them to point a client at a local stub server.
+    The async client is created on first use of achat. Every request goes
+    through the client's rate limiter, which 429 responses slow down.
+    Transient failures are retried up to max_retries times with jittered
+    exponential backoff. Tests pass an httpx.MockTransport as transport.
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: float = LLM_TIMEOUT,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self._endpoint = endpoint
+        self._api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.limiter = limiter or create_rate_limiter()
+        self.max_retries = max_retries
+        self.transport = transport
+        self.metrics = LLMMetrics()
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self._endpoint or os.environ.get("AZURE_OPENAI_ENDPOINT")
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.environ.get("AZURE_OPENAI_API_KEY")
+
+    @property
+    def configured(self) -> bool:
+        """Whether an endpoint and API key are set"""
+        return bool(self.endpoint and self.api_key)
+
+    def _headers(self) -> Dict[str, str]:
+        if not self.configured:
+            raise ValueError("Azure OpenAI API key and endpoint must be set as environment variables")
+        return {"Content-Type": "application/json", "api-key": self.api_key}
+
+    def _sync_client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        timeout=self.timeout, limits=self.limits, transport=self.transport
+                    )
+        return self._client
+
+    def _settle(self, tokens: int, response: Optional[httpx.Response]) -> None:
+        """Release a rate limiter slot with what the response tells about the quota"""
+        if response is None:
+            self.limiter.release(tokens, succeeded=False)
+        elif response.status_code == 429:
+            self.limiter.release(
+                tokens,
+                succeeded=False,
+                throttled=True,
+                retry_after=parse_retry_after(response.headers),
+            )
+        elif not response.is_success:
+            self.limiter.release(tokens, succeeded=False)
+        else:
+            try:
+                used = response.json().get("usage", {}).get("total_tokens")
+            except ValueError:
+                used = None
+            self.limiter.release(tokens, used_tokens=used)
+            self.metrics.add(tokens_used=used or 0)
+
+    def _failed_attempt(self, tokens: int, error: Exception) -> None:
+        """Count an attempt that raised"""
+        if isinstance(error, httpx.TimeoutException) and not isinstance(error, httpx.ConnectTimeout):
+            # The endpoint may have generated, and billed, a completion nobody received
+            self.metrics.add(timeouts=1, tokens_wasted=tokens)
+
+    def record_wasted(self, result: Dict[str, Any]) -> None:
+        """Count the tokens of a response the caller could not use"""
+        self.metrics.add(tokens_wasted=result.get("usage", {}).get("total_tokens") or 0)
+
+    def chat(self, request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Post a chat completions request
+
+        Args:
+            request_body: The request body, with messages and parameters
+
+        Returns:
+            dict: The parsed response
+
+        Raises:
+            httpx.HTTPError: If the request still fails after the retries, or
+                fails with a status that is not worth retrying
+        """
+        headers = self._headers()
+        tokens = estimate_tokens(request_body)
+        self.metrics.add(requests=1)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.add(retries=1)
+                # A 429 also pauses the limiter for its Retry-After
+                time.sleep(retry_delay(attempt))
+            self.limiter.acquire(tokens)
+            self.metrics.add(attempts=1)
+            response = None
+            try:
+                response = self._sync_client().post(self.endpoint, headers=headers, json=request_body)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError as e:
+                self._failed_attempt(tokens, e)
+                if not _transient(e) or attempt == self.max_retries:
+                    self.metrics.add(failed=1)
+                    raise
+                print(f"Retrying LLM request after attempt {attempt + 1} failed: {e}")
+            finally:
+                self._settle(tokens, response)
+
+    async def achat(self, request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of chat, for callers on the event loop"""
+        headers = self._headers()
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, transport=self.transport
+            )
+        tokens = estimate_tokens(request_body)
+        self.metrics.add(requests=1)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.add(retries=1)
+                await asyncio.sleep(retry_delay(attempt))
+            await self._acquire_async(tokens)
+            self.metrics.add(attempts=1)
+            response = None
+            try:
+                response = await self._async_client.post(self.endpoint, headers=headers, json=request_body)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError as e:
+                self._failed_attempt(tokens, e)
+                if not _transient(e) or attempt == self.max_retries:
+                    self.metrics.add(failed=1)
+                    raise
+                print(f"Retrying LLM request after attempt {attempt + 1} failed: {e}")
+            finally:
+                self._settle(tokens, response)
+
+    async def _acquire_async(self, tokens: int) -> None:
+        """Wait for a rate limiter slot without blocking the event loop"""
+        # The limiter blocks, so wait for it in a thread. Cancelling the wait
+        # does not stop the thread, so a slot it gets afterwards is handed back.
+        acquire = asyncio.ensure_future(asyncio.to_thread(self.limiter.acquire, tokens))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda done: self._release_unused(done, tokens))
+            raise
+
+    def _release_unused(self, acquire: "asyncio.Future", tokens: int) -> None:
+        """Release a slot acquired for a request that was cancelled before it was sent"""
+        if not acquire.cancelled() and acquire.exception() is None:
+            self.limiter.release(tokens, used_tokens=0, succeeded=False)
+
+    def close(self) -> None:
+        """Close the pooled connections of the sync client"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        """Close the pooled connections of both clients"""
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+def message_content(result: Dict[str, Any]) -> str:
+    """The generated text of a chat completions response"""
+    return result["choices"][0]["message"]["content"]
+
+
+llm_client = LLMClient()
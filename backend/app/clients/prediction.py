@@ -1,9 +1,8 @@
-import os
 import json
 from typing import Dict, List, Any, Optional
 from pydantic import BaseModel, Field
-import requests
 from dotenv import load_dotenv
+from app.clients.llm import llm_client, message_content
 
 load_dotenv()
 
@@ -45,13 +44,7 @@ def predict_case_win_likelihood(
     Returns:
         WinLikelihoodResponse: Structured response with win likelihood percentage and explanation
     """
-    # Azure OpenAI API configuration for o3-mini
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    o3_mini_deployment = os.environ.get("AZURE_OPENAI_O3_MINI_DEPLOYMENT", "o3-mini")
-    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
-    
-    if not api_key or not endpoint:
+    if not llm_client.configured:
         raise ValueError("Azure OpenAI API key and endpoint must be set as environment variables")
     
     # Format the evidence for the prompt
@@ -132,12 +125,6 @@ def predict_case_win_likelihood(
     """
 
     try:
-        # Prepare the API request
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
-        }
-        
         # Azure OpenAI API request body
         request_body = {
             "messages": [
@@ -148,18 +135,11 @@ def predict_case_win_likelihood(
             "response_format": {"type": "json_object"}
         }
         
-        # Make the API request to Azure OpenAI o3-mini
-        response = requests.post(
-            f"{endpoint}",
-            headers=headers,
-            json=request_body
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        # Make the API request to Azure OpenAI o3-mini over the shared connection pool
+        result = llm_client.chat(request_body)
         
         # Extract the generated content from Azure OpenAI response
-        generated_text = result["choices"][0]["message"]["content"]
+        generated_text = message_content(result)
         
         # Parse the JSON response
         try:
@@ -207,11 +187,7 @@ def generate_defense_reasoning(
     Returns:
         str: Formatted string with defense arguments and reasoning
     """
-    # Azure OpenAI API configuration for o3-mini
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    
-    if not api_key or not endpoint:
+    if not llm_client.configured:
         raise ValueError("Azure OpenAI API key and endpoint must be set as environment variables")
     
     # Format the evidence for the prompt
@@ -251,12 +227,6 @@ def generate_defense_reasoning(
     """
 
     try:
-        # Prepare the API request
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
-        }
-        
         # Azure OpenAI API request body
         request_body = {
             "messages": [
@@ -266,18 +236,11 @@ def generate_defense_reasoning(
             "temperature": 0.3
         }
         
-        # Make the API request to Azure OpenAI o3-mini
-        response = requests.post(
-            f"{endpoint}",
-            headers=headers,
-            json=request_body
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        # Make the API request to Azure OpenAI o3-mini over the shared connection pool
+        result = llm_client.chat(request_body)
         
         # Extract the generated content from Azure OpenAI response
-        generated_text = result["choices"][0]["message"]["content"]
+        generated_text = message_content(result)
         
         # Return the text directly
         return generated_text
@@ -0,0 +1,170 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# Seconds to pause after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 2.0
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    The level may go negative when a request turns out to cost more than
+    was taken for it up front; later takers then wait for the refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until the bucket holds amount, 0 if it does now"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds to wait from the retry-after-ms or Retry-After header of a response
+
+    Retry-After may be a number of seconds or an HTTP date.
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Admission control for LLM requests, shared by every caller in the process.
+
+    A request is let through once the requests/min and tokens/min buckets
+    hold enough for it and fewer than the current concurrency limit are in
+    flight. The limit follows AIMD: every successful request raises it by
+    1/limit (so by about one per round of requests) up to max_concurrency,
+    and a 429 halves it and pauses all requests for the Retry-After time.
+    Tokens are taken up front from an estimate and settled with the actual
+    usage once the response arrives.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        initial_concurrency: int = 2,
+        min_concurrency: int = 1,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+        self.throttled = 0
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._changed = threading.Condition()
+
+    def acquire(self, tokens: float) -> None:
+        """
+        Wait until a request estimated to use tokens may be sent
+
+        Every acquire must be followed by exactly one release.
+        """
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, now),
+                    self._tokens.wait_time(tokens, now),
+                )
+                if self.in_flight < int(self.concurrency):
+                    if wait <= 0:
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        self.in_flight += 1
+                        return
+                    self._changed.wait(wait)
+                else:
+                    # A release will notify; waiting for a refill is pointless before that
+                    self._changed.wait()
+
+    def release(
+        self,
+        tokens: float,
+        used_tokens: Optional[float] = None,
+        succeeded: bool = True,
+        throttled: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """
+        Report the outcome of an acquired request
+
+        Args:
+            tokens: The estimate passed to acquire
+            used_tokens: Tokens the request actually used, if known
+            succeeded: Whether a successful response came back
+            throttled: Whether the request was rejected with a 429
+            retry_after: Seconds the endpoint asked to wait, if it did
+        """
+        with self._changed:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self._tokens.give(tokens - used_tokens)
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                # Rejected requests do not count against the quota
+                self._tokens.give(tokens)
+                self._requests.give(1)
+                # Requests in flight during the same pause were sent at the old rate, decrease once
+                if now >= self._paused_until:
+                    self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+                wait = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+                self._paused_until = max(self._paused_until, now + wait)
+            elif succeeded:
+                self.concurrency = min(
+                    float(self.max_concurrency), self.concurrency + 1 / self.concurrency
+                )
+            self._changed.notify_all()
+
+    def snapshot(self) -> dict:
+        """Current limiter state, for logging and metrics"""
+        with self._changed:
+            now = time.monotonic()
+            return {
+                "concurrency": int(self.concurrency),
+                "inFlight": self.in_flight,
+                "throttled": self.throttled,
+                "pausedFor": max(0.0, self._paused_until - now),
+            }
@@ -0,0 +1,212 @@
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.db.embeddings import EmbeddingMatrix, select_top_k
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over the case embedding matrix.
+
+    An inverted-file (IVF) index: spherical k-means splits the embeddings
+    into n_lists clusters, and each cluster keeps the matrix rows assigned
+    to it. A search only scores the rows of the nprobe clusters whose
+    centroids are closest to the query. nprobe is the recall/latency knob:
+    probing more lists finds more true neighbours but scores more rows.
+
+    The index stores row numbers of the embedding matrix, not vectors.
+    Rows appended to the matrix after the index was built are assigned to
+    their nearest centroid by sync(), which persists the assignment, so
+    new cases are searchable without retraining. scripts/reembed.py calls
+    build() again after re-embedding the corpus to refresh the centroids,
+    and a running process reloads the index once its file changes.
+
+    Training never runs in a search: the app builds a missing index at
+    startup, and a corpus that grows past min_rows later is indexed in a
+    background thread while searches stay exact.
+    """
+
+    def __init__(
+        self,
+        embeddings: EmbeddingMatrix,
+        path: str,
+        nprobe: int = 8,
+        min_rows: int = 1000,
+    ):
+        self.embeddings = embeddings
+        self.path = path
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._building: Optional[threading.Thread] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        # Changes whenever the clusters or their members change
+        self.version = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._assignment = np.empty(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+        self._loaded = False
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self) -> None:
+        self._loaded = True
+        self._signature = self._stat()
+        if self._signature is None:
+            return
+        with np.load(self.path) as saved:
+            centroids, assignment = saved["centroids"], saved["assignment"]
+        if len(assignment) > len(self.embeddings):
+            # The matrix was replaced by a smaller one, the index is unusable
+            print(f"Ignoring stale similarity index {self.path}")
+            return
+        self._set(centroids, assignment)
+
+    def _set(self, centroids: np.ndarray, assignment: np.ndarray) -> None:
+        self._centroids = centroids
+        self._assignment = assignment.astype(np.int32)
+        order = np.argsort(self._assignment, kind="stable")
+        bounds = np.searchsorted(self._assignment[order], np.arange(len(centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        self.version += 1
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self._centroids, assignment=self._assignment)
+        os.replace(tmp_path, self.path)
+        self._signature = self._stat()
+
+    @staticmethod
+    def _assign(matrix: np.ndarray, centroids: np.ndarray, chunk: int = 4096) -> np.ndarray:
+        return np.concatenate(
+            [
+                np.argmax(matrix[start:start + chunk] @ centroids.T, axis=1)
+                for start in range(0, len(matrix), chunk)
+            ]
+        ).astype(np.int32)
+
+    def build(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Train the centroids on the current matrix and assign every row
+
+        Searches keep using the previous index, or exact search, until the
+        new one is trained.
+
+        Args:
+            n_lists: Number of clusters, defaults to about 4 * sqrt(rows)
+            iterations: k-means iterations
+            seed: Random seed for sampling and initialization
+        """
+        with self._build_lock:
+            _, matrix = self.embeddings.snapshot()
+            rows = len(matrix)
+            if rows == 0:
+                return
+            n_lists = min(n_lists or max(1, int(4 * np.sqrt(rows))), rows)
+
+            # Train on a sample, about 64 points per cluster is plenty
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(rows, min(rows, 64 * n_lists), replace=False))
+            sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._assign(sample, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=n_lists)
+                # Keep the previous centroid for clusters that lost all points
+                empty = counts == 0
+                sums[empty] = centroids[empty]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = sums / np.where(norms == 0, 1.0, norms)
+            assignment = self._assign(matrix, centroids)
+
+            with self._lock:
+                # Rows appended meanwhile are assigned by the next sync
+                self._set(centroids, assignment)
+                self._save()
+                self._loaded = True
+
+    def _build_in_background(self) -> None:
+        if self._building is None or not self._building.is_alive():
+            self._building = threading.Thread(target=self.build, name="ivf-build", daemon=True)
+            self._building.start()
+
+    def refresh(self) -> None:
+        """Load the index on first use, or again if another process (e.g. reembed.py) rebuilt it"""
+        with self._lock:
+            if not self._loaded or self._stat() != self._signature:
+                self._load()
+
+    def sync(self, build: bool = False) -> None:
+        """
+        Assign matrix rows added since the last build or sync to their nearest centroid
+
+        Args:
+            build: Train a missing index in this thread instead of in the background
+        """
+        with self._lock:
+            self.refresh()
+            _, matrix = self.embeddings.snapshot()
+            untrained = self._centroids is None
+            if not untrained:
+                start = len(self._assignment)
+                if len(matrix) > start:
+                    new = self._assign(matrix[start:], self._centroids)
+                    self._set(self._centroids, np.concatenate([self._assignment, new]))
+                    self._save()
+        # Trained outside the search lock, so searches go on meanwhile
+        if untrained and len(matrix) >= self.min_rows:
+            if build:
+                self.build()
+            else:
+                self._build_in_background()
+
+    def top_k(
+        self,
+        query: Iterable[float],
+        k: int,
+        threshold: float = -1.0,
+        exclude: Iterable[str] = (),
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Approximate cosine top-k search, same contract as EmbeddingMatrix.top_k
+
+        Falls back to the exact search while the corpus is smaller than
+        min_rows, where scanning everything is already fast.
+
+        Args:
+            nprobe: Number of clusters to scan, defaults to the index setting
+        """
+        self.sync()
+        with self._lock:
+            if self._centroids is None:
+                return self.embeddings.top_k(query, k, threshold=threshold, exclude=exclude)
+            ids, matrix = self.embeddings.snapshot()
+            centroids, lists = self._centroids, self._lists
+        if k <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        nprobe = min(nprobe or self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.sort(np.concatenate([lists[i] for i in probe]))
+
+        scores = matrix[rows] @ query
+        excluded_rows = [self.embeddings.row_of(case_id) for case_id in exclude]
+        scores[np.isin(rows, [row for row in excluded_rows if row is not None])] = -np.inf
+        return [
+            (ids[rows[i]], float(scores[i])) for i in select_top_k(scores, k, threshold)
+        ]
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_results (
+    document TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (document, chunk)
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_results_status ON chunk_results (status);
+CREATE INDEX IF NOT EXISTS idx_chunk_results_last_used ON chunk_results (last_used);
+"""
+
+DONE = "done"
+FAILED = "failed"
+
+
+class ChunkResultStore:
+    """
+    Persistent results of the per-chunk LLM extraction, per document.
+
+    A document is identified by a hash of its text, the chunk size and the
+    extraction version, so the same upload splits into the same chunks.
+    Chunks that were extracted are kept with their result and chunks that
+    failed are recorded as such, so extracting the document again only
+    calls the LLM for the failed or missing chunks.
+
+    Reading or writing a document marks it as recently used, and once more
+    than max_documents are stored the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_documents: int = 2000):
+        self.path = path
+        self.max_documents = max_documents
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def key(text: str, chunk_size: int, version: str) -> str:
+        """Document key for a text split into chunks of chunk_size"""
+        return hashlib.sha256(f"{version}\0{chunk_size}\0{text}".encode("utf-8")).hexdigest()
+
+    def results(self, document: str) -> Dict[int, dict]:
+        """Results of the extracted chunks of a document, by chunk number"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT chunk, result FROM chunk_results WHERE document = ? AND status = ?",
+                (document, DONE),
+            ).fetchall()
+            self.reused += len(rows)
+            self._conn.execute(
+                "UPDATE chunk_results SET last_used = ? WHERE document = ?",
+                (time.time(), document),
+            )
+            self._evict()
+        return {chunk: json.loads(result) for chunk, result in rows}
+
+    def failed(self, document: str) -> List[int]:
+        """Numbers of the chunks of a document whose extraction failed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk FROM chunk_results WHERE document = ? AND status = ? ORDER BY chunk",
+                (document, FAILED),
+            ).fetchall()
+        return [chunk for (chunk,) in rows]
+
+    def save(self, document: str, chunk: int, result: dict) -> None:
+        """Store the result of an extracted chunk"""
+        self._record(document, chunk, DONE, json.dumps(result), None)
+
+    def fail(self, document: str, chunk: int, error: str) -> None:
+        """Record a failed chunk, to be extracted again next time"""
+        self._record(document, chunk, FAILED, None, error)
+
+    def _record(self, document, chunk, status, result, error) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO chunk_results VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (document, chunk) DO UPDATE SET status = excluded.status, "
+                "result = excluded.result, attempts = attempts + 1, "
+                "error = excluded.error, last_used = excluded.last_used",
+                (document, chunk, status, result, error, time.time()),
+            )
+
+    def _evict(self) -> None:
+        """Drop the least recently used documents beyond max_documents"""
+        documents = self._conn.execute(
+            "SELECT COUNT(DISTINCT document) FROM chunk_results"
+        ).fetchone()[0]
+        if documents > self.max_documents:
+            self._conn.execute(
+                "DELETE FROM chunk_results WHERE document IN ("
+                "SELECT document FROM chunk_results GROUP BY document "
+                "ORDER BY MAX(last_used) LIMIT ?)",
+                (documents - self.max_documents,),
+            )
+
+    def summary(self) -> dict:
+        """Chunk counts for metrics"""
+        with self._lock:
+            documents, done, failed, failed_documents, retried = self._conn.execute(
+                "SELECT COUNT(DISTINCT document), "
+                "COALESCE(SUM(status = ?), 0), COALESCE(SUM(status = ?), 0), "
+                "COUNT(DISTINCT CASE WHEN status = ? THEN document END), "
+                "COALESCE(SUM(attempts > 1), 0) FROM chunk_results",
+                (DONE, FAILED, FAILED),
+            ).fetchone()
+            reused = self.reused
+        return {
+            "documents": documents,
+            "extractedChunks": done,
+            "failedChunks": failed,
+            "documentsWithFailedChunks": failed_documents,
+            "rerunChunks": retried,
+            "reusedChunks": reused,
+        }
@@ -1,63 +1,384 @@
 import json
 import os
-from typing import Dict, List, Optional
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
 from app.models.models import Case, CaseSummary
+from app.db.ann import IVFIndex
+from app.db.embeddings import EmbeddingMatrix
+from app.db.chunk_results import ChunkResultStore
+from app.db.jobs import JobQueue
+from app.db.store import CaseStore, JsonCaseStore
+from app.db.dimensions import DimensionTable
+from app.db.search import SearchIndex
+from app.db.stats import (
+    STATUS_BUCKETS,
+    BitmapIndexView,
+    StatsView,
+    TimeSeriesView,
+    status_bucket,
+)
+from app.db.views import SortedIndexView, SummaryView
+from app.db.sqlite_store import SqliteCaseStore
+
+load_dotenv()
 
 # Paths
 DB_DIR = os.path.dirname(os.path.abspath(__file__))
 CASES_DB_PATH = os.path.join(DB_DIR, "cases.json")
+CASES_SQLITE_PATH = os.environ.get(
+    "CASES_SQLITE_PATH", os.path.join(DB_DIR, "cases.sqlite3")
+)
+CASE_EMBEDDINGS_PATH = os.environ.get(
+    "CASE_EMBEDDINGS_PATH", os.path.join(DB_DIR, "case_embeddings.npy")
+)
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.join(DB_DIR, "embedding_cache.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+
+# Similar-case search: "exact" (default) or "ivf" for the approximate index
+SIMILARITY_INDEX = os.environ.get("SIMILARITY_INDEX", "exact").lower()
+SIMILARITY_INDEX_PATH = os.path.splitext(CASE_EMBEDDINGS_PATH)[0] + ".ivf.npz"
+# Number of IVF clusters scanned per query, higher means better recall but slower
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "8"))
+
+# Extra alias rules for canonical dimension values: {field: {pattern: canonical}}
+DIMENSION_ALIASES_PATH = os.environ.get(
+    "DIMENSION_ALIASES_PATH", os.path.join(DB_DIR, "dimension_aliases.json")
+)
+# Dimensions whose canonical value replaces the extracted one when a case is stored
+CANONICAL_FIELDS = ["affectedCar", "affectedPart"]
+
+# Case ingestion jobs and the uploaded documents they are waiting to process
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(DB_DIR, "jobs.sqlite3"))
+UPLOADS_DIR = os.environ.get("UPLOADS_DIR", os.path.join(DB_DIR, "uploads"))
+# Number of background threads running ingestion jobs
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "1"))
+# Seconds before a job whose document chunks partly failed runs again
+INGEST_RETRY_DELAY = float(os.environ.get("INGEST_RETRY_DELAY", "300"))
+# Seconds without a heartbeat before a running job counts as abandoned by its process
+INGEST_JOB_STALE_AFTER = float(os.environ.get("INGEST_JOB_STALE_AFTER", "60"))
+
+# Per-chunk LLM extraction results, so failed chunks can be re-run alone
+CHUNK_RESULTS_PATH = os.environ.get(
+    "CHUNK_RESULTS_PATH", os.path.join(DB_DIR, "chunk_results.sqlite3")
+)
+CHUNK_RESULTS_MAX_DOCUMENTS = int(os.environ.get("CHUNK_RESULTS_MAX_DOCUMENTS", "2000"))
+
+# Storage backend: "json" (default) or "sqlite"
+CASES_DB_BACKEND = os.environ.get("CASES_DB_BACKEND", "json").lower()
+
+
+def create_store(backend: str = CASES_DB_BACKEND) -> CaseStore:
+    """Create the case store for the configured storage backend"""
+    embeddings = EmbeddingMatrix(CASE_EMBEDDINGS_PATH)
+    if backend == "json":
+        return JsonCaseStore(CASES_DB_PATH, embeddings)
+    if backend == "sqlite":
+        return SqliteCaseStore(CASES_SQLITE_PATH, embeddings)
+    raise ValueError(f"Unknown CASES_DB_BACKEND '{backend}', expected 'json' or 'sqlite'")
+
+
+# Resident case store, loaded once and shared by all requests
+_store = create_store()
+# store.version starts over in every process, this tells processes apart
+_INSTANCE_ID = uuid.uuid4().hex[:8]
+
+# Fields the case list can be sorted by
+SORTABLE_FIELDS = ["date", "status", "caseType"]
+
+# Persistent queue of case ingestion jobs
+_jobs = JobQueue(JOBS_DB_PATH, stale_after=INGEST_JOB_STALE_AFTER)
+
+# Extracted and failed chunks of the ingested documents
+_chunk_results = ChunkResultStore(CHUNK_RESULTS_PATH, max_documents=CHUNK_RESULTS_MAX_DOCUMENTS)
+
+# Canonical car, part and jurisdiction values shared by the stats views
+_dimensions = DimensionTable()
+if os.path.exists(DIMENSION_ALIASES_PATH):
+    with open(DIMENSION_ALIASES_PATH, "r") as f:
+        _dimensions.add_aliases(json.load(f))
+
+# Derived views, kept up to date on every write
+_summaries = SummaryView()
+_sorted = SortedIndexView(SORTABLE_FIELDS)
+_search = SearchIndex()
+_stats = StatsView(_dimensions)
+_timeseries = TimeSeriesView(_dimensions)
+_bitmaps = BitmapIndexView(_dimensions)
+_store.attach(_summaries)
+_store.attach(_sorted)
+_store.attach(_search)
+_store.attach(_stats)
+_store.attach(_timeseries)
+_store.attach(_bitmaps)
+_similarity_index = (
+    IVFIndex(_store.embeddings, SIMILARITY_INDEX_PATH, nprobe=IVF_NPROBE)
+    if SIMILARITY_INDEX == "ivf"
+    else None
+)
+
+
+def get_store() -> CaseStore:
+    """Get the process-wide case store"""
+    return _store
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide case ingestion job queue"""
+    return _jobs
+
+
+def get_chunk_results() -> ChunkResultStore:
+    """Get the process-wide store of per-chunk extraction results"""
+    return _chunk_results
+
+
+def get_embeddings() -> EmbeddingMatrix:
+    """Get the embedding matrix of the process-wide case store"""
+    # Loading the store moves any inline embeddings into the matrix
+    _store.refresh()
+    return _store.embeddings
+
+
+def get_similarity_index():
+    """
+    Get the index used for similar-case search
+
+    Returns:
+        The IVFIndex when SIMILARITY_INDEX=ivf, otherwise the embedding
+        matrix itself for exact search. Both expose the same top_k method.
+    """
+    embeddings = get_embeddings()
+    return _similarity_index or embeddings
+
+
+def warm_up_similarity_index() -> None:
+    """Load the IVF index, training it if it is missing, so no search has to"""
+    if _similarity_index is not None:
+        _similarity_index.sync(build=True)
+
+
+def rebuild_similarity_index() -> bool:
+    """
+    Retrain the IVF index on the current embeddings, e.g. after re-embedding
+
+    An index file left by an earlier SIMILARITY_INDEX=ivf run is rebuilt
+    as well, so it is not stale when the setting is switched back.
+    Running processes reload the rebuilt index on their next search.
+
+    Returns:
+        bool: Whether an index was built
+    """
+    index = _similarity_index or IVFIndex(
+        get_embeddings(), SIMILARITY_INDEX_PATH, nprobe=IVF_NPROBE
+    )
+    if not os.path.exists(SIMILARITY_INDEX_PATH) and (
+        _similarity_index is None or len(get_embeddings()) < index.min_rows
+    ):
+        return False
+    index.build()
+    return True
+
+
+def get_data_version() -> str:
+    """
+    Get an identifier of the current state of the case data
+
+    It changes whenever a case or embedding is written, the backing
+    storage is reloaded or the IVF similarity index is rebuilt, so it can
+    be used as an HTTP validator for derived responses. It stats the
+    storage files, so call it off the event loop.
+    """
+    with _store.reading():
+        _store.embeddings.refresh()
+        version = f"{_INSTANCE_ID}-{_store.version}-{_store.embeddings.version}"
+    if _similarity_index is not None:
+        _similarity_index.refresh()
+        version += f"-{_similarity_index.version}"
+    return version
 
 
 # Database Operations
 def get_all_cases() -> List[dict]:
     """Get all cases as a list"""
-    try:
-        with open(CASES_DB_PATH, "r") as f:
-            cases = json.load(f)
-        return list(cases.values())
-    except (json.JSONDecodeError, FileNotFoundError):
-        # If there's a problem with the file, reinitialize it
-        init_db()
-        with open(CASES_DB_PATH, "r") as f:
-            cases = json.load(f)
-        return list(cases.values())
-
-
-def get_case_summaries() -> List[CaseSummary]:
+    return _store.all()
+
+
+def get_case_summaries() -> List[dict]:
     """Get summaries of all cases for listing"""
-    cases = get_all_cases()
-    return cases
+    with _store.reading():
+        return _summaries.all()
+
+
+def _project(summary: dict, fields: Optional[List[str]]) -> dict:
+    """Select fields for the case list, from the summary when possible"""
+    if not fields:
+        return summary
+    source = summary
+    if any(field not in summary for field in fields):
+        source = _store.get(summary["id"]) or summary
+    return {field: source[field] for field in ["id", *fields] if field in source}
+
+
+def list_cases(
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[dict], int]:
+    """
+    Get one page of case summaries
+
+    Args:
+        search: Optional full-text query, matches are ranked by relevance
+        sort: Field to sort by, one of SORTABLE_FIELDS, or None for store
+            order (relevance order when searching)
+        descending: Sort in descending order
+        offset: Number of cases to skip
+        limit: Maximum number of cases to return, None for all
+        fields: Fields to return, defaults to the summary fields
+
+    Returns:
+        tuple: (cases on the page, total number of matching cases)
+    """
+    with _store.reading():
+        if search:
+            matches = [case_id for case_id, _ in _search.search(search)]
+            total = len(matches)
+            if sort:
+                page_ids = _sorted.page_of(sort, set(matches), descending, offset, limit)
+            else:
+                end = None if limit is None else offset + limit
+                page_ids = matches[offset:end]
+            page = [_summaries.get(case_id) for case_id in page_ids]
+        elif sort:
+            total = len(_summaries)
+            page = [_summaries.get(case_id) for case_id in _sorted.page(sort, descending, offset, limit)]
+        else:
+            total = len(_summaries)
+            page = _summaries.slice(offset, limit)
+        return [_project(case, fields) for case in page], total
 
 
 def get_case_by_id(case_id: str) -> Optional[dict]:
     """Get a single case by its ID"""
-    with open(CASES_DB_PATH, "r") as f:
-        cases = json.load(f)
-    return cases.get(case_id)
+    return _store.get(case_id)
 
 
-def get_stats():
-    """Get statistics for trends dashboard"""
-    cases = get_all_cases()
+def get_similar_cases(case_id: str, k: int = 5, threshold: float = 0.5) -> List[dict]:
+    """
+    Find the cases most similar to a stored case against the current corpus
 
-    # Normalize status for win/loss/in progress/settled
-    won_cases = sum(
-        1
-        for case in cases
-        if str(case.get("status", "")).strip().lower() == "in favour of defendant"
-    )
-    lost_cases = sum(
-        1
-        for case in cases
-        if str(case.get("status", "")).strip().lower() == "in favour of plaintiff"
-    )
-    settled_cases = sum(
-        1 for case in cases if str(case.get("status", "")).strip().lower() == "settled"
-    )
-    in_progress_cases = sum(
-        1 for case in cases if "progress" in str(case.get("status", "")).strip().lower()
-    )
-    total_cases = len(cases)
+    Args:
+        case_id: The ID of the case to find similar cases for
+        k: Maximum number of similar cases to return
+        threshold: Minimum similarity score to include a case
+
+    Returns:
+        List of {"id", "score"} dicts, most similar first. Empty if the case
+        has no embedding yet.
+    """
+    index = get_similarity_index()
+    embedding = get_embeddings().get(case_id)
+    if embedding is None:
+        return []
+    similar = index.top_k(embedding, k, threshold=threshold, exclude=[case_id])
+    # Deleted cases keep their embedding row
+    return [
+        {"id": similar_id, "score": round(score, 4)}
+        for similar_id, score in similar
+        if _store.get(similar_id) is not None
+    ]
+
+
+def hybrid_search_cases(
+    query: str, query_embedding, limit: int = 20, candidates: int = 100
+) -> List[dict]:
+    """
+    Rank cases by fusing lexical BM25 and embedding similarity results
+
+    Both result lists are combined with reciprocal-rank fusion, so a case
+    ranked high by either method ends up near the top, and cases found by
+    both rank highest.
+
+    Args:
+        query: The search query for the lexical index
+        query_embedding: The embedding of the same query
+        limit: Maximum number of cases to return
+        candidates: Number of results taken from each method before fusing
+
+    Returns:
+        List of case summaries with their fused "score", best first
+    """
+    rrf_k = 60
+    index = get_similarity_index()
+    with _store.reading():
+        lexical = [case_id for case_id, _ in _search.search(query, limit=candidates)]
+    semantic = [case_id for case_id, _ in index.top_k(query_embedding, candidates)]
+
+    scores: Dict[str, float] = {}
+    for ranking in (lexical, semantic):
+        for rank, case_id in enumerate(ranking, start=1):
+            scores[case_id] = scores.get(case_id, 0.0) + 1.0 / (rrf_k + rank)
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    results = []
+    with _store.reading():
+        for case_id, score in ranked:
+            summary = _summaries.get(case_id)
+            if summary is not None:
+                results.append({**summary, "score": round(score, 6)})
+            if len(results) == limit:
+                break
+    return results
+
+
+def _mask(filters: Dict[str, str]) -> int:
+    """Bitmap of the cases matching stats filters, see get_stats"""
+    filters = dict(filters)
+    date_from = filters.pop("date_from", None)
+    date_to = filters.pop("date_to", None)
+    return _bitmaps.mask(filters, date_from, date_to)
+
+
+def _counts(field: str, filters: Optional[Dict[str, str]]) -> Counter:
+    """Case counts per value of a field, from the running counters when unfiltered"""
+    if not filters:
+        return _stats.labelled(field)
+    return _bitmaps.counts(field, _mask(filters))
+
+
+def _status_counts(filters: Optional[Dict[str, str]]) -> Counter:
+    if not filters:
+        return _stats.statuses
+    statuses = Counter()
+    for status, count in _counts("status", filters).items():
+        bucket = status_bucket(status)
+        if bucket is not None:
+            statuses[bucket] += count
+    return statuses
+
+
+def get_stats(filters: Optional[Dict[str, str]] = None):
+    """Get statistics for trends dashboard
+
+    Args:
+        filters: Optional exact values for any of FILTER_FIELDS, plus
+            "date_from"/"date_to" (YYYY-MM-DD, inclusive) for the filing
+            date. The same filters apply to all stats functions.
+    """
+    with _store.reading():
+        total_cases = _stats.total if not filters else _mask(filters).bit_count()
+        statuses = _status_counts(filters)
+        won_cases = statuses["In favour of defendant"]
+        lost_cases = statuses["In favour of plaintiff"]
+        settled_cases = statuses["Settled"]
+        in_progress_cases = statuses["In Progress"]
 
     win_rate = (won_cases / total_cases) * 100 if total_cases > 0 else 0
     loss_rate = (lost_cases / total_cases) * 100 if total_cases > 0 else 0
@@ -73,47 +394,44 @@ def get_stats():
     }
 
 
-def get_car_stats():
+def _specified_counts(field: str, filters: Optional[Dict[str, str]]) -> List[Tuple[str, int]]:
+    """Case counts of a field, without empty and "Not specified" values"""
+    with _store.reading():
+        return [
+            (value, count)
+            for value, count in _counts(field, filters).items()
+            if value and value != "Not specified"
+        ]
+
+
+def get_car_stats(filters: Optional[Dict[str, str]] = None):
     """Get statistics about car models involved in cases"""
-    cases = get_all_cases()
-    car_counts = {}
-    for case in cases:
-        car = case.get("affectedCar", None)
-        if car and car != "Not specified":
-            car_counts[car] = car_counts.get(car, 0) + 1
-    return [{"model": model, "count": count} for model, count in car_counts.items()]
+    return [
+        {"model": model, "count": count}
+        for model, count in _specified_counts("affectedCar", filters)
+    ]
 
 
-def get_part_stats():
+def get_part_stats(filters: Optional[Dict[str, str]] = None):
     """Get statistics about car parts involved in cases"""
-    cases = get_all_cases()
-    part_counts = {}
-    for case in cases:
-        part = case.get("affectedPart", None)
-        if part and part != "Not specified":
-            part_counts[part] = part_counts.get(part, 0) + 1
-    return [{"part": part, "count": count} for part, count in part_counts.items()]
-
-
-def get_status_stats():
-    cases = get_all_cases()
-    status_counts = {
-        "In favour of defendant": 0,
-        "In favour of plaintiff": 0,
-        "In Progress": 0,
-        "Settled": 0,
-    }
+    return [
+        {"part": part, "count": count}
+        for part, count in _specified_counts("affectedPart", filters)
+    ]
+
+
+def get_jurisdiction_stats(filters: Optional[Dict[str, str]] = None):
+    """Get statistics about the state jurisdictions of cases"""
+    return [
+        {"jurisdiction": jurisdiction, "count": count}
+        for jurisdiction, count in _specified_counts("stateJurisdiction", filters)
+    ]
 
-    for case in cases:
-        status = str(case.get("status", "")).strip().lower()
-        if status == "in favour of defendant":
-            status_counts["In favour of defendant"] += 1
-        elif status == "in favour of plaintiff":
-            status_counts["In favour of plaintiff"] += 1
-        elif status == "settled":
-            status_counts["Settled"] += 1
-        elif "progress" in status:
-            status_counts["In Progress"] += 1
+
+def get_status_stats(filters: Optional[Dict[str, str]] = None):
+    with _store.reading():
+        statuses = _status_counts(filters)
+        status_counts = {status: statuses[status] for status in STATUS_BUCKETS}
 
     return [
         {"status": status, "count": count}
@@ -122,9 +440,88 @@ def get_status_stats():
     ]
 
 
+def get_dashboard(filters: Optional[Dict[str, str]] = None) -> dict:
+    """Get every trends dashboard aggregate from one consistent read of the counters"""
+    with _store.reading():
+        return {
+            "stats": get_stats(filters),
+            "cars": get_car_stats(filters),
+            "parts": get_part_stats(filters),
+            "status": get_status_stats(filters),
+            "jurisdictions": get_jurisdiction_stats(filters),
+        }
+
+
+def get_timeseries(
+    bucket: str = "month",
+    group_by: str = "affectedPart",
+    filters: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    Get case counts over filing dates
+
+    Args:
+        bucket: Time bucket size, "month", "quarter" or "year"
+        group_by: Field to split the counts by, one of TIMESERIES_FIELDS
+        filters: Optional stats filters, see get_stats
+
+    Returns:
+        dict: The bucket labels and one series of counts per field value
+    """
+    with _store.reading():
+        if not filters:
+            buckets, series = _timeseries.series(group_by, bucket)
+        else:
+            buckets, series = _bitmaps.series(group_by, _mask(filters), bucket)
+    return {
+        "bucket": bucket,
+        "groupBy": group_by,
+        "buckets": buckets,
+        "series": [{"group": group, "counts": counts} for group, counts in series.items()],
+    }
+
+
+def check_stats(rebuild: bool = True) -> bool:
+    """
+    Verify the running statistics counters against a full recount
+
+    Only meaningful inside the server process, whose counters have been
+    updated write by write; main.py runs it every STATS_CHECK_INTERVAL.
+
+    Args:
+        rebuild: Rebuild the counters from scratch if they drifted
+
+    Returns:
+        bool: True if the counters were consistent
+    """
+    with _store.reading():
+        cases = {case["id"]: case for case in _store.all()}
+        consistent = _stats.verify(cases)
+        if not consistent:
+            print("Statistics counters drifted from the stored cases")
+            if rebuild:
+                _stats.reset(cases)
+        return consistent
+
+
+def _canonicalize(case_data: Dict) -> Dict:
+    """Copy of a case with its car and part replaced by their canonical values"""
+    return {
+        **case_data,
+        **{
+            field: _dimensions.canonical(field, case_data[field])
+            for field in CANONICAL_FIELDS
+            if field in case_data
+        },
+    }
+
+
 def add_new_case(case_id: str, case_data: Dict) -> bool:
     """Add a new case to the database
 
+    The affected car and part are stored with their canonical values
+    (e.g. "X5" for "2019 BMW X5 SUV"), the same ones the stats group by.
+
     Args:
         case_id: The ID of the new case
         case_data: The case data to add
@@ -133,18 +530,45 @@ def add_new_case(case_id: str, case_data: Dict) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        # Load the current cases
-        with open(CASES_DB_PATH, "r") as f:
-            cases = json.load(f)
-
-        # Add the new case
-        cases[case_id] = case_data
-
-        # Save the updated cases
-        with open(CASES_DB_PATH, "w") as f:
-            json.dump(cases, f, indent=2)
-
+        _store.put(case_id, _canonicalize(case_data))
+        if _similarity_index is not None:
+            # Make the new case searchable without retraining the index
+            _similarity_index.sync()
         return True
     except Exception as e:
         print(f"Error adding new case: {e}")
         return False
+
+
+def delete_case(case_id: str) -> bool:
+    """Delete a case from the database
+
+    Args:
+        case_id: The ID of the case to delete
+
+    Returns:
+        bool: True if the case existed and was deleted
+    """
+    return _store.delete(case_id)
+
+
+def enqueue_ingestion(case_id: str, payload: dict) -> dict:
+    """Queue a job that creates a case from spooled documents
+
+    Args:
+        case_id: The ID the new case will get
+        payload: The spooled files, see app.ingest.spool_uploads
+
+    Returns:
+        dict: The queued job
+    """
+    return _jobs.enqueue(case_id, payload)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Get the status of an ingestion job, without its internal payload"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+    job.pop("payload")
+    return job
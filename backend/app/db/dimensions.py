@@ -0,0 +1,144 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+NOT_SPECIFIED = "Not specified"
+
+# Lowercase spellings the extractors use for a missing value
+UNSPECIFIED_VALUES = {"", "not specified", "unspecified", "n/a", "na", "none", "unknown", "null"}
+
+US_STATES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
+    "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
+    "District of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
+    "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA", "Kansas": "KS",
+    "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS",
+    "Missouri": "MO", "Montana": "MT", "Nebraska": "NE", "Nevada": "NV",
+    "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM", "New York": "NY",
+    "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK",
+    "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI", "South Carolina": "SC",
+    "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT",
+    "Vermont": "VT", "Virginia": "VA", "Washington": "WA", "West Virginia": "WV",
+    "Wisconsin": "WI", "Wyoming": "WY",
+}
+
+# Alias table: per dimension, the first rule whose pattern is found in the
+# lowercased value gives the canonical value. Templates may refer to the
+# pattern's groups, e.g. "2019 BMW X5 SUV" matches r"\bx\s?([1-7])\b" -> "X5".
+DIMENSION_ALIASES: Dict[str, List[Tuple[str, str]]] = {
+    "affectedCar": [
+        (r"\bx\s?([1-7])\b", "X{1}"),
+        (r"\bix\b", "iX"),
+        (r"\bi\s?([3-8])\b", "i{1}"),
+        (r"\bm\s?([2-8])\b", "M{1}"),
+        (r"\bz\s?([34])\b", "Z{1}"),
+        (r"\b([1-8])\s*-?\s*series\b", "{1} Series"),
+        # Model designations such as 328i or 750Li belong to the series of their first digit
+        (r"\b([1-8])\d{2}(?:[a-z]{1,2})?\b", "{1} Series"),
+        (r"\bmini\b", "MINI"),
+        (r"\bbmw\b", "BMW (model not specified)"),
+    ],
+    "affectedPart": [
+        (r"\bair\s?bags?\b", "Airbag"),
+        (r"\bbrak(?:e|es|ing)\b", "Braking system"),
+        (r"\bengines?\b", "Engine"),
+        (r"\b(?:transmission|gearbox)\b", "Transmission"),
+        (r"\bcatalytic\b", "Catalytic converter"),
+        (r"\bfuel\s+pump\b", "Fuel pump"),
+        (r"\bsteering\b", "Steering"),
+        (r"\bseat\s?belts?\b", "Seat belt"),
+        (r"\b(?:driving|driver)\s+assist", "Driving Assistant"),
+        (r"\b(?:software|infotainment|idrive)\b", "Software"),
+        (r"\belectric(?:al)?\b", "Electrical system"),
+    ],
+    "stateJurisdiction": [
+        # Longest names first, so "West Virginia" is not taken for "Virginia"
+        *((rf"\b{name.lower()}\b", name) for name in sorted(US_STATES, key=len, reverse=True)),
+        *((rf"^{code.lower()}\.?$", name) for name, code in US_STATES.items()),
+    ],
+}
+
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+def clean_value(value) -> str:
+    """Collapse whitespace, and map the spellings of a missing value to NOT_SPECIFIED"""
+    value = SPACE_PATTERN.sub(" ", "" if value is None else str(value)).strip()
+    return NOT_SPECIFIED if value.lower() in UNSPECIFIED_VALUES else value
+
+
+class DimensionTable:
+    """
+    Canonical, interned values of the grouped case dimensions.
+
+    Free-text values written by the extractors, e.g. "BMW X5", "X5" and
+    "2019 BMW X5 SUV", are mapped to one canonical value ("X5") with the
+    alias rules of their dimension, and every canonical value gets a small
+    integer id per dimension. Views count and group by these ids, so the
+    long raw strings are hashed only once per distinct spelling. Unknown
+    values are kept, minus model years for cars. New cases are stored
+    with the canonical car and part (see database.add_new_case); other
+    dimensions keep their original strings for display.
+    """
+
+    def __init__(self, aliases: Dict[str, List[Tuple[str, str]]] = DIMENSION_ALIASES):
+        self._rules = {
+            field: [(re.compile(pattern), template) for pattern, template in rules]
+            for field, rules in aliases.items()
+        }
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self._labels: Dict[str, List[str]] = {}
+        self._interned: Dict[str, Dict[str, int]] = {}
+
+    def add_aliases(self, aliases: Dict[str, Dict[str, str]]) -> None:
+        """
+        Add alias rules that take precedence over the built-in ones
+
+        Args:
+            aliases: {field: {pattern: canonical template}}
+        """
+        for field, rules in aliases.items():
+            self._rules[field] = [
+                (re.compile(pattern), template) for pattern, template in rules.items()
+            ] + self._rules.get(field, [])
+        # Spellings may map differently now, ids of canonical values stay valid
+        self._interned = {}
+
+    def canonical(self, field: str, value) -> str:
+        """Canonical value of a raw dimension value"""
+        value = clean_value(value)
+        if value == NOT_SPECIFIED:
+            return value
+        if field == "affectedCar":
+            value = clean_value(YEAR_PATTERN.sub("", value))
+        lowered = value.lower()
+        for pattern, template in self._rules.get(field, []):
+            match = pattern.search(lowered)
+            if match:
+                return template.format(match.group(0), *match.groups())
+        return value
+
+    def intern(self, field: str, value) -> int:
+        """Id of the canonical value of a raw dimension value, assigned on first use"""
+        key = "" if value is None else str(value)
+        interned = self._interned.setdefault(field, {})
+        dimension_id = interned.get(key)
+        if dimension_id is None:
+            canonical = self.canonical(field, value)
+            ids = self._ids.setdefault(field, {})
+            dimension_id = ids.get(canonical)
+            if dimension_id is None:
+                labels = self._labels.setdefault(field, [])
+                dimension_id = ids[canonical] = len(labels)
+                labels.append(canonical)
+            interned[key] = dimension_id
+        return dimension_id
+
+    def lookup(self, field: str, value) -> Optional[int]:
+        """Id of the canonical value of a raw value, or None if no case has it"""
+        return self._ids.get(field, {}).get(self.canonical(field, value))
+
+    def label(self, field: str, dimension_id: int) -> str:
+        """Canonical value of an id"""
+        return self._labels[field][dimension_id]
@@ -0,0 +1,82 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used);
+"""
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by a hash of model name and exact input text.
+
+    Entries live in a SQLite database so they survive restarts. Every hit
+    refreshes the entry's last-used time, and once the cache grows past
+    max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        """Cache key for embedding text with a given model"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up several keys and mark the hits as recently used"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                found.update(
+                    (key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows
+                )
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        """Store several embeddings and evict the least recently used overflow"""
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?)", rows
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def select_top_k(scores: np.ndarray, k: int, threshold: float = -1.0) -> np.ndarray:
+    """
+    Positions of the k highest scores that reach the threshold, best first
+
+    argpartition selects the k best without sorting all scores; only the
+    selected ones are sorted.
+    """
+    candidates = np.flatnonzero(scores >= threshold)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class EmbeddingMatrix:
+    """
+    Case embeddings stored as a contiguous float32 .npy matrix.
+
+    The matrix is memory-mapped, so loading it costs nothing up front and
+    rows are paged in on demand. A small JSON sidecar holds the case id of
+    every row. The matrix is allocated with spare capacity and grows by
+    doubling, so appending a case is amortized O(1).
+
+    Row data is written and flushed before the id index is replaced, so a
+    crash mid-write never exposes a row without its embedding.
+
+    version increases whenever the matrix is loaded or written.
+    """
+
+    def __init__(self, path: str, dtype=np.float32):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".ids.json"
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self.version = 0
+        self._data: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._loaded = False
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self) -> None:
+        self._signature = self._stat()
+        if self._signature is None or not os.path.exists(self.path):
+            self._data, self._ids = None, []
+        else:
+            with open(self.index_path, "r") as f:
+                self._ids = json.load(f)["ids"]
+            self._data = np.load(self.path, mmap_mode="r+")
+        self._rows = {case_id: row for row, case_id in enumerate(self._ids)}
+        self._loaded = True
+        self.version += 1
+
+    def refresh(self) -> None:
+        """Remap the matrix if another process replaced it since the last load"""
+        with self._lock:
+            if not self._loaded or self._stat() != self._signature:
+                self._load()
+
+    def _write_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"ids": self._ids}, f)
+        os.replace(tmp_path, self.index_path)
+        self._signature = self._stat()
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        if self._data is not None and self._data.shape[0] >= rows:
+            return
+        capacity = max(rows, 64, 2 * (self._data.shape[0] if self._data is not None else 0))
+        tmp_path = f"{self.path}.tmp.npy"
+        grown = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, dim)
+        )
+        if self._data is not None:
+            grown[: len(self._ids)] = self._data[: len(self._ids)]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.path)
+        self._data = np.load(self.path, mmap_mode="r+")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._ids)
+
+    def __contains__(self, case_id: str) -> bool:
+        with self._lock:
+            self.refresh()
+            return case_id in self._rows
+
+    def row_of(self, case_id: str) -> Optional[int]:
+        """Get the matrix row of a case, or None if it has no embedding"""
+        with self._lock:
+            self.refresh()
+            return self._rows.get(case_id)
+
+    def get(self, case_id: str) -> Optional[np.ndarray]:
+        """Get the embedding of a single case, or None if it has none"""
+        with self._lock:
+            self.refresh()
+            row = self._rows.get(case_id)
+            return None if row is None else np.asarray(self._data[row])
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Get the row ids and a read-only view of the populated rows
+
+        Returns:
+            tuple: (ids, matrix) where matrix[i] is the embedding of ids[i]
+        """
+        with self._lock:
+            self.refresh()
+            if self._data is None:
+                return [], np.empty((0, 0), dtype=self.dtype)
+            matrix = self._data[: len(self._ids)].view()
+            matrix.flags.writeable = False
+            return list(self._ids), matrix
+
+    def top_k(
+        self,
+        query: Iterable[float],
+        k: int,
+        threshold: float = -1.0,
+        exclude: Iterable[str] = (),
+    ) -> List[Tuple[str, float]]:
+        """
+        Exact cosine top-k search over all rows
+
+        Rows are L2-normalized, so one matrix-vector product gives the cosine
+        similarity to every case.
+
+        Args:
+            query: The query embedding
+            k: Maximum number of results
+            threshold: Minimum similarity score to include a case
+            exclude: Case ids to leave out of the results
+
+        Returns:
+            list: (case_id, score) pairs, highest score first
+        """
+        query = np.asarray(query, dtype=self.dtype)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            ids, matrix = self.snapshot()
+            excluded_rows = [self._rows[case_id] for case_id in exclude if case_id in self._rows]
+        if not ids or k <= 0:
+            return []
+
+        scores = matrix @ query
+        scores[excluded_rows] = -np.inf
+        return [(ids[row], float(scores[row])) for row in select_top_k(scores, k, threshold)]
+
+    def put_many(self, items: Iterable[Tuple[str, Iterable[float]]]) -> None:
+        """Insert or overwrite the embeddings of several cases"""
+        items = [(case_id, np.asarray(vector, dtype=self.dtype)) for case_id, vector in items]
+        if not items:
+            return
+        with self._lock:
+            self.refresh()
+            new_ids = [case_id for case_id, _ in items if case_id not in self._rows]
+            new_ids = list(dict.fromkeys(new_ids))
+            self._ensure_capacity(len(self._ids) + len(new_ids), items[0][1].shape[0])
+            for case_id in new_ids:
+                self._rows[case_id] = len(self._ids)
+                self._ids.append(case_id)
+            for case_id, vector in items:
+                self._data[self._rows[case_id]] = vector
+            self._data.flush()
+            self._write_index()
+            self.version += 1
+
+    def install(self, ids: List[str], data_path: str) -> None:
+        """
+        Replace the whole matrix with a fully written .npy file
+
+        The data file is swapped in first and the id index second. Readers
+        only remap when the index changes, so they never see the new data
+        with the old ids. Callers should keep existing ids at their current
+        rows, which keeps the old index valid against the new data too.
+
+        Args:
+            ids: The case id of every row of the new matrix
+            data_path: Path of the new .npy file, moved into place
+        """
+        with self._lock:
+            os.replace(data_path, self.path)
+            self._ids = list(ids)
+            self._write_index()
+            self._load()
+
+    def put(self, case_id: str, vector: Iterable[float]) -> None:
+        """Insert or overwrite the embedding of a single case"""
+        self.put_many([(case_id, vector)])
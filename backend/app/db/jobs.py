@@ -0,0 +1,256 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    progress REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    run_after REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+COLUMNS = (
+    "id, case_id, status, stage, progress, attempts, error, payload, created_at, updated_at, "
+    "run_after, owner, heartbeat"
+)
+
+# Columns added after the first release, with their definitions
+MIGRATIONS = {
+    "run_after": "REAL NOT NULL DEFAULT 0",
+    "owner": "TEXT",
+    "heartbeat": "REAL NOT NULL DEFAULT 0",
+}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _to_dict(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "caseId": row["case_id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "progress": row["progress"],
+        "attempts": row["attempts"],
+        "error": row["error"],
+        "payload": json.loads(row["payload"]),
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+    }
+
+
+class JobQueue:
+    """
+    Persistent FIFO queue of case ingestion jobs in a SQLite database.
+
+    Jobs survive restarts: a job that was running when its process stopped
+    is queued again by recover(), until it has used up max_attempts.
+    Workers block in claim() until a job is queued, and every claim marks
+    the job running in the same transaction, so no job is run twice.
+    retry() queues a job again after a delay, as long as it has attempts left.
+
+    Several processes (e.g. uvicorn workers) may share the database. Every
+    queue has its own owner ID, which claim() stores on the job along with
+    a heartbeat. The owner refreshes the heartbeat of its running jobs with
+    heartbeat(), and recover() only takes back running jobs whose heartbeat
+    is older than stale_after, i.e. whose process stopped.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3, stale_after: float = 60.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        missing = [column for column in MIGRATIONS if column not in columns]
+        with self._conn:
+            for column in missing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {MIGRATIONS[column]}")
+
+    def enqueue(self, case_id: str, payload: dict, delay: float = 0.0) -> dict:
+        """
+        Queue a new job
+
+        Args:
+            case_id: The ID the ingested case will get
+            payload: JSON-serializable job input, e.g. the spooled file paths
+            delay: Seconds to wait before the job may be claimed
+
+        Returns:
+            dict: The new job
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._queued, self._conn:
+            self._conn.execute(
+                f"INSERT INTO jobs ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, case_id, QUEUED, QUEUED, 0.0, 0, None, json.dumps(payload),
+                    now, now, now + delay, None, 0.0,
+                ),
+            )
+            self._queued.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Get a job by its ID"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else _to_dict(row)
+
+    def claim(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Take the oldest queued job and mark it running
+
+        Args:
+            timeout: Seconds to wait for a job, None to wait forever
+
+        Returns:
+            The claimed job, or None if none was queued before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queued:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND run_after <= ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, time.time()),
+                ).fetchone()
+                if row is not None:
+                    with self._conn:
+                        now = time.time()
+                        claimed = self._conn.execute(
+                            "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, "
+                            "owner = ?, heartbeat = ? WHERE id = ? AND status = ?",
+                            (RUNNING, now, self.owner, now, row["id"], QUEUED),
+                        ).rowcount
+                    if claimed:
+                        job = self._conn.execute(
+                            "SELECT * FROM jobs WHERE id = ?", (row["id"],)
+                        ).fetchone()
+                        return _to_dict(job)
+                    # Another process claimed it first
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # Jobs may also be queued by another process or become due, so poll as well
+                self._queued.wait(min(remaining, 5.0) if remaining is not None else 5.0)
+
+    def update(self, job_id: str, stage: str, progress: float) -> None:
+        """Record the pipeline stage a running job has reached"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ?, heartbeat = ? WHERE id = ?",
+                (stage, progress, now, now, job_id),
+            )
+
+    def heartbeat(self) -> None:
+        """Mark the jobs this queue is running as alive, call more often than stale_after"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE status = ? AND owner = ?",
+                (time.time(), RUNNING, self.owner),
+            )
+
+    def finish(self, job_id: str, error: Optional[str] = None) -> None:
+        """Mark a job as done, with a note on what it could not do, if anything"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = 1.0, error = ?, "
+                "updated_at = ? WHERE id = ?",
+                (DONE, DONE, error, time.time(), job_id),
+            )
+
+    def retry(self, job_id: str, error: str, delay: float) -> bool:
+        """
+        Queue a running job again once delay seconds have passed
+
+        Args:
+            job_id: The job to retry
+            error: Why the job has to run again
+            delay: Seconds to wait before the job may be claimed
+
+        Returns:
+            bool: False if the job has used up max_attempts and was left running
+        """
+        now = time.time()
+        with self._queued, self._conn:
+            retried = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, updated_at = ?, run_after = ? "
+                "WHERE id = ? AND attempts < ?",
+                (QUEUED, "retrying", error, now, now + delay, job_id, self.max_attempts),
+            ).rowcount
+            self._queued.notify()
+        return bool(retried)
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def recover(self) -> List[str]:
+        """
+        Requeue the running jobs whose process stopped
+
+        A job counts as abandoned once its heartbeat is older than
+        stale_after, so jobs that other live processes are running are left
+        alone. Jobs that already used max_attempts are failed instead, so a
+        job that crashes the process does not do so forever.
+
+        Returns:
+            list: IDs of the requeued jobs
+        """
+        requeued = []
+        with self._queued, self._conn:
+            now = time.time()
+            cutoff = now - self.stale_after
+            rows = self._conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND heartbeat < ?",
+                (RUNNING, cutoff),
+            ).fetchall()
+            for row in rows:
+                if row["attempts"] < self.max_attempts:
+                    status, error = QUEUED, None
+                else:
+                    status, error = FAILED, "Interrupted too many times"
+                # Checked again in the update, another process may recover it first
+                changed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = COALESCE(?, error), updated_at = ?, "
+                    "owner = NULL WHERE id = ? AND status = ? AND heartbeat < ?",
+                    (status, error, now, row["id"], RUNNING, cutoff),
+                ).rowcount
+                if changed and status == QUEUED:
+                    requeued.append(row["id"])
+            self._queued.notify_all()
+        return requeued
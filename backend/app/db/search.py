@@ -0,0 +1,147 @@
+import bisect
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.db.store import CaseView
+
+# Searchable fields and how much a term occurrence in them counts
+SEARCH_FIELDS = {
+    "title": 3.0,
+    "jurisdiction": 2.0,
+    "caseSummary": 1.0,
+    "description": 1.0,
+    "plaintiffArgumentation": 1.0,
+    "relevantLaws": 1.0,
+}
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _field_text(value) -> str:
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value)
+    return "" if value is None else str(value)
+
+
+class SearchIndex(CaseView):
+    """
+    In-process inverted index with BM25 ranking over the case text fields.
+
+    Every term maps to the weighted term frequency per case. A sorted
+    vocabulary allows prefix matching, so "airb" finds "airbag" while the
+    user is still typing. Cases are indexed incrementally on insert and delete, and a
+    query only touches the postings of its own terms.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    max_prefix_expansions = 64
+
+    def __init__(self, fields: Dict[str, float] = SEARCH_FIELDS):
+        self.fields = fields
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+
+    def _terms(self, case: dict) -> Counter:
+        terms = Counter()
+        for field, weight in self.fields.items():
+            for token in tokenize(_field_text(case.get(field))):
+                terms[token] += weight
+        return terms
+
+    def _add(self, case_id: str, case: dict) -> None:
+        terms = self._terms(case)
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            postings[case_id] = frequency
+        length = sum(terms.values())
+        self._doc_lengths[case_id] = length
+        self._total_length += length
+
+    def _remove(self, case_id: str, case: dict) -> None:
+        for term in self._terms(case):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(case_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        self._total_length -= self._doc_lengths.pop(case_id, 0.0)
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self._postings, self._vocabulary = {}, []
+        self._doc_lengths, self._total_length = {}, 0.0
+        for case_id, case in cases.items():
+            self._add(case_id, case)
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if old is not None:
+            self._remove(case_id, old)
+        self._add(case_id, new)
+
+    def remove(self, case_id: str, old: dict) -> None:
+        self._remove(case_id, old)
+
+    def _expand(self, token: str) -> List[str]:
+        """The token itself plus the most frequent vocabulary terms it is a prefix of"""
+        start = bisect.bisect_left(self._vocabulary, token)
+        end = bisect.bisect_left(self._vocabulary, token + "\uffff")
+        matches = self._vocabulary[start:end]
+        if len(matches) > self.max_prefix_expansions:
+            matches = sorted(matches, key=lambda term: len(self._postings[term]), reverse=True)
+            matches = matches[: self.max_prefix_expansions]
+            if token in self._postings and token not in matches:
+                matches.append(token)
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Rank the cases that match every query token, exactly or by prefix
+
+        Returns:
+            list: (case_id, score) pairs, best match first
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._doc_lengths:
+            return []
+
+        documents = len(self._doc_lengths)
+        average_length = self._total_length / documents or 1.0
+        scores: Optional[Dict[str, float]] = None
+        for token in tokens:
+            # Best scoring expansion of this token per case
+            token_scores: Dict[str, float] = {}
+            for term in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for case_id, frequency in postings.items():
+                    norm = 1 - self.b + self.b * self._doc_lengths[case_id] / average_length
+                    score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                    if score > token_scores.get(case_id, 0.0):
+                        token_scores[case_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    case_id: score + token_scores[case_id]
+                    for case_id, score in scores.items()
+                    if case_id in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked if limit is None else ranked[:limit]
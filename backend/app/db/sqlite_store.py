@@ -0,0 +1,129 @@
+import json
+import sqlite3
+from typing import Dict, Iterable
+
+from app.db.embeddings import EmbeddingMatrix
+from app.db.store import CaseStore
+
+# Scalar case fields that get their own indexed column
+INDEXED_COLUMNS = [
+    "status",
+    "affectedCar",
+    "affectedPart",
+    "stateJurisdiction",
+    "caseType",
+    "date",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    affectedCar TEXT,
+    affectedPart TEXT,
+    stateJurisdiction TEXT,
+    caseType TEXT,
+    date TEXT,
+    data TEXT NOT NULL
+);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_cases_{column} ON cases ({column});\n"
+    for column in INDEXED_COLUMNS
+)
+
+
+def _to_row(case_id: str, case_data: dict) -> tuple:
+    """Split a case into its indexed columns and a JSON column for the rest"""
+    # Indexed keys set to None stay in the JSON, a NULL column alone reads as a missing key
+    nested = {
+        k: v for k, v in case_data.items() if k not in INDEXED_COLUMNS or v is None
+    }
+    return (
+        case_id,
+        *(case_data.get(column) for column in INDEXED_COLUMNS),
+        json.dumps(nested),
+    )
+
+
+def _from_row(row: sqlite3.Row) -> dict:
+    case_data = json.loads(row["data"])
+    for column in INDEXED_COLUMNS:
+        if row[column] is not None:
+            case_data[column] = row[column]
+    return case_data
+
+
+class SqliteCaseStore(CaseStore):
+    """
+    Case store backed by a SQLite database.
+
+    Inserts write a single row instead of rewriting the whole corpus. The
+    resident copy is only reloaded when another connection commits to the
+    database, which SQLite reports through PRAGMA data_version.
+    """
+
+    def __init__(self, path: str, embeddings: EmbeddingMatrix):
+        super().__init__(embeddings)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._data_version = None
+
+    def _current_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _is_stale(self) -> bool:
+        return self._current_data_version() != self._data_version
+
+    def _load(self) -> Dict[str, dict]:
+        self._data_version = self._current_data_version()
+        rows = self._conn.execute("SELECT * FROM cases")
+        return {row["id"]: _from_row(row) for row in rows}
+
+    def _persist(self, case_id: str, case_data: dict, cases: Dict[str, dict]) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cases VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                _to_row(case_id, case_data),
+            )
+
+    def _persist_all(self, cases: Dict[str, dict]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cases VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [_to_row(case_id, case_data) for case_id, case_data in cases.items()],
+            )
+
+    def _persist_delete(self, case_id: str, cases: Dict[str, dict]) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM cases WHERE id = ?", (case_id,))
+
+    def import_cases(self, cases: Iterable[tuple]) -> int:
+        """
+        Bulk insert (case_id, case_data) pairs in a single transaction
+
+        Returns:
+            int: The number of imported cases
+        """
+        cases = {case_id: dict(case_data) for case_id, case_data in cases}
+        with self._lock:
+            self._split_embeddings(cases)
+            self._persist_all(cases)
+            self._loaded = False
+        return len(cases)
+
+    def import_json(self, json_path: str) -> int:
+        """
+        One-shot migration of an existing cases.json into this database
+
+        Args:
+            json_path: Path to the JSON file mapping case ids to cases
+
+        Returns:
+            int: The number of imported cases
+        """
+        with open(json_path, "r") as f:
+            cases = json.load(f)
+        return self.import_cases(cases.items())
@@ -0,0 +1,401 @@
+import bisect
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.db.dimensions import DimensionTable
+from app.db.store import CaseView
+
+# Dimensions with a running count per distinct value
+COUNTED_FIELDS = ["status", "affectedCar", "affectedPart", "stateJurisdiction"]
+
+# Dimensions the statistics can be filtered and grouped on
+FILTER_FIELDS = ["status", "affectedCar", "affectedPart", "stateJurisdiction", "caseType"]
+
+# Dimensions the time series can be grouped by
+TIMESERIES_FIELDS = ["affectedPart", "affectedCar", "status", "caseType"]
+
+# Months per time bucket
+BUCKET_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+DATE_PATTERN = re.compile(r"^\s*(\d{4})-(\d{1,2})")
+
+# Dashboard status buckets, in display order
+STATUS_BUCKETS = [
+    "In favour of defendant",
+    "In favour of plaintiff",
+    "In Progress",
+    "Settled",
+]
+
+
+def status_bucket(status) -> Optional[str]:
+    """Normalize a raw case status to one of STATUS_BUCKETS, or None"""
+    status = str(status or "").strip().lower()
+    if status == "in favour of defendant":
+        return "In favour of defendant"
+    if status == "in favour of plaintiff":
+        return "In favour of plaintiff"
+    if status == "settled":
+        return "Settled"
+    if "progress" in status:
+        return "In Progress"
+    return None
+
+
+class StatsView(CaseView):
+    """
+    Running case counts for the statistics endpoints.
+
+    Keeps one Counter of dimension ids per counted field plus the status
+    buckets, adjusted by +1/-1 on every insert, update and delete. Reading
+    the stats costs the number of distinct values, not the number of cases.
+    """
+
+    def __init__(self, dimensions: DimensionTable, fields: List[str] = COUNTED_FIELDS):
+        self.dimensions = dimensions
+        self.fields = fields
+        self.total = 0
+        self.counts: Dict[str, Counter] = {field: Counter() for field in fields}
+        self.statuses = Counter()
+
+    def _count(self, case: dict, delta: int) -> None:
+        self.total += delta
+        for field, counter in self.counts.items():
+            key = self.dimensions.intern(field, case.get(field))
+            counter[key] += delta
+            if counter[key] == 0:
+                del counter[key]
+        bucket = status_bucket(case.get("status"))
+        if bucket is not None:
+            self.statuses[bucket] += delta
+            if self.statuses[bucket] == 0:
+                del self.statuses[bucket]
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self.total = 0
+        self.counts = {field: Counter() for field in self.fields}
+        self.statuses = Counter()
+        for case in cases.values():
+            self._count(case, 1)
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if old is not None:
+            self._count(old, -1)
+        self._count(new, 1)
+
+    def remove(self, case_id: str, old: dict) -> None:
+        self._count(old, -1)
+
+    def labelled(self, field: str) -> Counter:
+        """Case counts per canonical value of a counted field"""
+        return Counter(
+            {self.dimensions.label(field, key): count for key, count in self.counts[field].items()}
+        )
+
+    def verify(self, cases: Dict[str, dict]) -> bool:
+        """
+        Check the running counts against a full recount of the cases
+
+        Returns:
+            bool: True if every counter matches the recount
+        """
+        fresh = StatsView(self.dimensions, self.fields)
+        fresh.reset(cases)
+        return (
+            fresh.total == self.total
+            and fresh.counts == self.counts
+            and fresh.statuses == self.statuses
+        )
+
+
+def month_of(date) -> Optional[int]:
+    """Months since year 0 of a YYYY-MM[-DD] date, or None if it does not parse"""
+    match = DATE_PATTERN.match(str(date or ""))
+    if match is None or not 1 <= int(match.group(2)) <= 12:
+        return None
+    return int(match.group(1)) * 12 + int(match.group(2)) - 1
+
+
+def bucket_label(key: int, bucket: str) -> str:
+    """Display label of a bucket key, i.e. months since year 0 // BUCKET_MONTHS[bucket]"""
+    if bucket == "year":
+        return str(key)
+    if bucket == "quarter":
+        return f"{key // 4}-Q{key % 4 + 1}"
+    return f"{key // 12}-{key % 12 + 1:02d}"
+
+
+def _group_value(case: dict, field: str):
+    return _group_of(field, case.get(field))
+
+
+def _group_of(field: str, value):
+    """The time series group of a field value, statuses are grouped into STATUS_BUCKETS"""
+    if field == "status":
+        return status_bucket(value) or value
+    return value
+
+
+def bucket_totals(first_month: Optional[int], counts: np.ndarray, bucket: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Sum the rows of consecutive months into time buckets
+
+    Args:
+        first_month: Month (since year 0) of the first row
+        counts: One row per month, one column per group
+        bucket: "month", "quarter" or "year"
+
+    Returns:
+        tuple: (bucket labels, the column totals of each bucket), from the
+        first to the last bucket with cases
+    """
+    nonempty = np.flatnonzero(counts.sum(axis=1))
+    if len(nonempty) == 0:
+        return [], counts[:0]
+
+    months = first_month + np.arange(nonempty[0], nonempty[-1] + 1)
+    counts = counts[nonempty[0]: nonempty[-1] + 1]
+    keys = months // BUCKET_MONTHS[bucket]
+    # Month rows are consecutive, so every bucket is one contiguous run of rows
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    totals = np.add.reduceat(counts, starts, axis=0)
+    return [bucket_label(int(key), bucket) for key in keys[starts]], totals
+
+
+class TimeSeriesView(CaseView):
+    """
+    Case counts per filing month, grouped by a few case dimensions.
+
+    Every grouped field has a dense int64 matrix with one row per month
+    (from the earliest filing month on) and one column per dimension id.
+    A write adjusts one cell per field. Quarters and years are summed from
+    the month rows when read, so no bucket size needs its own aggregate.
+    Cases without a parseable date are not counted.
+    """
+
+    def __init__(self, dimensions: DimensionTable, fields: List[str] = TIMESERIES_FIELDS):
+        self.dimensions = dimensions
+        self.fields = fields
+        self.reset({})
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self._first_month: Optional[int] = None
+        self._counts: Dict[str, np.ndarray] = {
+            field: np.zeros((0, 0), dtype=np.int64) for field in self.fields
+        }
+        for case in cases.values():
+            self._count(case, 1)
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if old is not None:
+            self._count(old, -1)
+        self._count(new, 1)
+
+    def remove(self, case_id: str, old: dict) -> None:
+        self._count(old, -1)
+
+    def _row(self, month: int) -> int:
+        """Matrix row of a month, growing every matrix to cover it"""
+        if self._first_month is None:
+            self._first_month = month
+        if month < self._first_month:
+            for field, counts in self._counts.items():
+                self._counts[field] = np.pad(counts, ((self._first_month - month, 0), (0, 0)))
+            self._first_month = month
+        row = month - self._first_month
+        for field, counts in self._counts.items():
+            if row >= counts.shape[0]:
+                self._counts[field] = np.pad(counts, ((0, row + 1 - counts.shape[0]), (0, 0)))
+        return row
+
+    def _column(self, field: str, value) -> int:
+        column = self.dimensions.intern(field, value)
+        counts = self._counts[field]
+        if column >= counts.shape[1]:
+            # Grow by doubling, new dimension values are common while ingesting
+            grow = max(column + 1, 2 * counts.shape[1]) - counts.shape[1]
+            self._counts[field] = np.pad(counts, ((0, 0), (0, grow)))
+        return column
+
+    def _count(self, case: dict, delta: int) -> None:
+        month = month_of(case.get("date"))
+        if month is None:
+            return
+        row = self._row(month)
+        for field in self.fields:
+            column = self._column(field, _group_value(case, field))
+            self._counts[field][row, column] += delta
+
+    def series(self, field: str, bucket: str = "month") -> Tuple[List[str], Dict[str, List[int]]]:
+        """
+        Case counts per time bucket and value of a field
+
+        Args:
+            field: One of the grouped fields
+            bucket: "month", "quarter" or "year"
+
+        Returns:
+            tuple: (bucket labels, {canonical value: counts per bucket}), covering
+            bucket from the first to the last one with cases
+        """
+        labels, totals = bucket_totals(self._first_month, self._counts[field], bucket)
+        return labels, {
+            self.dimensions.label(field, column): totals[:, column].tolist()
+            for column in np.flatnonzero(totals.any(axis=0))
+        }
+
+
+class BitmapIndexView(CaseView):
+    """
+    Bitmap index for filtered statistics.
+
+    Every case gets a slot number, and every dimension id of a filter field
+    has an int bitmap with the bits of the slots of the cases holding that value.
+    A filter is the AND of the bitmaps of its values, a date range the OR of
+    the bitmaps of the dates in it, and a count per group value is the
+    popcount of its bitmap ANDed with the filter. No case record is touched.
+    Slots of deleted cases are reused.
+    """
+
+    def __init__(self, dimensions: DimensionTable, fields: List[str] = FILTER_FIELDS):
+        self.dimensions = dimensions
+        self.fields = fields
+        self.reset({})
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._live = 0
+        self._bitmaps: Dict[str, Dict[int, int]] = {field: {} for field in self.fields}
+        self._dates: List[str] = []
+        self._date_bitmaps: Dict[str, int] = {}
+        for case_id, case in cases.items():
+            self._add(case_id, case)
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if old is not None:
+            self._remove(case_id, old)
+        self._add(case_id, new)
+
+    def remove(self, case_id: str, old: dict) -> None:
+        self._remove(case_id, old)
+
+    def _keys(self, case: dict):
+        for field in self.fields:
+            yield self._bitmaps[field], self.dimensions.intern(field, case.get(field))
+
+    def _add(self, case_id: str, case: dict) -> None:
+        slot = self._free.pop() if self._free else len(self._slots)
+        self._slots[case_id] = slot
+        bit = 1 << slot
+        self._live |= bit
+        for bitmaps, key in self._keys(case):
+            bitmaps[key] = bitmaps.get(key, 0) | bit
+        date = str(case.get("date") or "")
+        if month_of(date) is not None:
+            if date not in self._date_bitmaps:
+                bisect.insort(self._dates, date)
+            self._date_bitmaps[date] = self._date_bitmaps.get(date, 0) | bit
+
+    def _remove(self, case_id: str, case: dict) -> None:
+        slot = self._slots.pop(case_id)
+        self._free.append(slot)
+        bit = 1 << slot
+        self._live &= ~bit
+        for bitmaps, key in self._keys(case):
+            bitmap = bitmaps.get(key, 0) & ~bit
+            if bitmap:
+                bitmaps[key] = bitmap
+            else:
+                bitmaps.pop(key, None)
+        date = str(case.get("date") or "")
+        if date in self._date_bitmaps:
+            bitmap = self._date_bitmaps[date] & ~bit
+            if bitmap:
+                self._date_bitmaps[date] = bitmap
+            else:
+                del self._date_bitmaps[date]
+                del self._dates[bisect.bisect_left(self._dates, date)]
+
+    def mask(
+        self,
+        filters: Dict[str, str],
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> int:
+        """
+        Bitmap of the cases matching all filters
+
+        Args:
+            filters: Required value per filter field, any spelling of a
+                canonical value matches
+            date_from: Earliest filing date (YYYY-MM-DD), inclusive
+            date_to: Latest filing date (YYYY-MM-DD), inclusive
+
+        Returns:
+            int: Bitmap of the matching slots
+        """
+        mask = self._live
+        for field, value in filters.items():
+            key = self.dimensions.lookup(field, value)
+            mask &= 0 if key is None else self._bitmaps[field].get(key, 0)
+        if date_from or date_to:
+            start = bisect.bisect_left(self._dates, date_from) if date_from else 0
+            # A date_to day includes any longer timestamp on that day
+            end = bisect.bisect_right(self._dates, date_to + "\uffff") if date_to else len(self._dates)
+            in_range = 0
+            for date in self._dates[start:end]:
+                in_range |= self._date_bitmaps[date]
+            mask &= in_range
+        return mask
+
+    def counts(self, field: str, mask: int) -> Counter:
+        """Number of cases in the mask per canonical value of a filter field"""
+        counts = Counter()
+        for key, bitmap in self._bitmaps[field].items():
+            count = (bitmap & mask).bit_count()
+            if count:
+                counts[self.dimensions.label(field, key)] = count
+        return counts
+
+    def series(
+        self, field: str, mask: int, bucket: str = "month"
+    ) -> Tuple[List[str], Dict[str, List[int]]]:
+        """
+        Case counts in the mask per time bucket and value of a field
+
+        Same result as TimeSeriesView.series restricted to the mask. Each
+        count is the popcount of a month bitmap ANDed with a value bitmap.
+
+        Args:
+            field: One of the filter fields
+            mask: Bitmap of the cases to count, see mask
+            bucket: "month", "quarter" or "year"
+        """
+        months: Dict[int, int] = {}
+        for date in self._dates:
+            bitmap = self._date_bitmaps[date] & mask
+            if bitmap:
+                month = month_of(date)
+                months[month] = months.get(month, 0) | bitmap
+        if not months:
+            return [], {}
+
+        keys = [key for key, bitmap in self._bitmaps[field].items() if bitmap & mask]
+        first_month = min(months)
+        counts = np.zeros((max(months) - first_month + 1, len(keys)), dtype=np.int64)
+        for month, month_bitmap in months.items():
+            for column, key in enumerate(keys):
+                counts[month - first_month, column] = (
+                    month_bitmap & self._bitmaps[field][key]
+                ).bit_count()
+
+        labels, totals = bucket_totals(first_month, counts, bucket)
+        groups: Dict[str, np.ndarray] = {}
+        for column, key in enumerate(keys):
+            group = _group_of(field, self.dimensions.label(field, key))
+            groups[group] = groups.get(group, 0) + totals[:, column]
+        return labels, {group: total.tolist() for group, total in groups.items() if total.any()}
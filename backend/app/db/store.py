@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.db.embeddings import EmbeddingMatrix
+
+EMBEDDING_FIELD = "caseEmbedding"
+
+
+class CaseView(ABC):
+    """
+    Derived in-memory view over the cases of a store.
+
+    Views are attached to a store and kept up to date on every write, so
+    readers get precomputed answers instead of scanning the corpus. They are
+    rebuilt from scratch whenever the store reloads its cases.
+    """
+
+    @abstractmethod
+    def reset(self, cases: Dict[str, dict]) -> None:
+        """Rebuild the view from all cases"""
+
+    @abstractmethod
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        """Update the view for an inserted (old is None) or replaced case"""
+
+    @abstractmethod
+    def remove(self, case_id: str, old: dict) -> None:
+        """Update the view for a deleted case"""
+
+
+class CaseStore(ABC):
+    """
+    Resident case repository.
+
+    Cases are kept in memory as a dict indexed by case id. Subclasses decide
+    where the cases are persisted and when the in-memory copy is stale.
+    Writes go through the store so the in-memory copy and the backing
+    storage never drift apart.
+
+    Case embeddings are not part of the stored records. They are split off
+    into the binary embedding matrix on write, and records that still carry
+    an inline embedding are migrated the first time they are loaded.
+
+    Attached CaseViews are rebuilt on every load and updated on every write
+    or delete.
+    version increases with every change, so it can be used to tell whether
+    anything derived from the store is still current.
+
+    Returned case dicts are shared with the store and must not be mutated.
+    """
+
+    def __init__(self, embeddings: EmbeddingMatrix):
+        self.embeddings = embeddings
+        self.version = 0
+        self._lock = threading.RLock()
+        self._cases: Dict[str, dict] = {}
+        self._views: List[CaseView] = []
+        self._loaded = False
+
+    @abstractmethod
+    def _is_stale(self) -> bool:
+        """Whether the backing storage changed since the last load"""
+
+    @abstractmethod
+    def _load(self) -> Dict[str, dict]:
+        """Read all cases from the backing storage"""
+
+    @abstractmethod
+    def _persist(self, case_id: str, case_data: dict, cases: Dict[str, dict]) -> None:
+        """Write an inserted or replaced case, cases already holds it"""
+
+    @abstractmethod
+    def _persist_all(self, cases: Dict[str, dict]) -> None:
+        """Write all cases"""
+
+    @abstractmethod
+    def _persist_delete(self, case_id: str, cases: Dict[str, dict]) -> None:
+        """Remove a deleted case, cases no longer holds it"""
+
+    def _split_embeddings(self, cases: Dict[str, dict]) -> int:
+        """
+        Move inline embeddings into the embedding matrix and drop them from the records
+
+        Returns:
+            int: The number of moved embeddings
+        """
+        inline = [
+            (case_id, case.pop(EMBEDDING_FIELD))
+            for case_id, case in cases.items()
+            if EMBEDDING_FIELD in case
+        ]
+        self.embeddings.put_many(inline)
+        return len(inline)
+
+    def refresh(self) -> None:
+        """Reload the cases if the backing storage changed since the last load"""
+        with self._lock:
+            if not self._loaded or self._is_stale():
+                cases = self._load()
+                moved = self._split_embeddings(cases)
+                if moved:
+                    # Rewrite the records once without their inline embeddings
+                    self._persist_all(cases)
+                    print(f"Moved {moved} inline case embeddings into {self.embeddings.path}")
+                self._cases = cases
+                self._loaded = True
+                self.version += 1
+                for view in self._views:
+                    view.reset(cases)
+
+    def attach(self, view: CaseView) -> None:
+        """Attach a view that is maintained on every load and write"""
+        with self._lock:
+            self._views.append(view)
+            if self._loaded:
+                view.reset(self._cases)
+
+    @contextmanager
+    def reading(self):
+        """Hold the store fresh and unchanged while reading attached views"""
+        with self._lock:
+            self.refresh()
+            yield
+
+    def all(self) -> List[dict]:
+        """Get all cases as a list"""
+        with self._lock:
+            self.refresh()
+            return list(self._cases.values())
+
+    def get(self, case_id: str) -> Optional[dict]:
+        """Get a single case by its ID"""
+        with self._lock:
+            self.refresh()
+            return self._cases.get(case_id)
+
+    def put(self, case_id: str, case_data: dict) -> None:
+        """Insert or replace a case and persist it"""
+        with self._lock:
+            self.refresh()
+            if EMBEDDING_FIELD in case_data:
+                case_data = dict(case_data)
+                self.embeddings.put(case_id, case_data.pop(EMBEDDING_FIELD))
+            old = self._cases.get(case_id)
+            # Updated in place, the lock keeps readers out until the write is done
+            self._cases[case_id] = case_data
+            try:
+                self._persist(case_id, case_data, self._cases)
+            except Exception:
+                if old is None:
+                    del self._cases[case_id]
+                else:
+                    self._cases[case_id] = old
+                raise
+            self.version += 1
+            for view in self._views:
+                view.upsert(case_id, old, case_data)
+
+    def delete(self, case_id: str) -> bool:
+        """
+        Delete a case and persist the deletion
+
+        The embedding stays in the matrix, which only grows; similarity
+        results are filtered against the store.
+
+        Returns:
+            bool: False if there was no case with this ID
+        """
+        with self._lock:
+            self.refresh()
+            old = self._cases.get(case_id)
+            if old is None:
+                return False
+            del self._cases[case_id]
+            try:
+                self._persist_delete(case_id, self._cases)
+            except Exception:
+                self._cases[case_id] = old
+                raise
+            self.version += 1
+            for view in self._views:
+                view.remove(case_id, old)
+            return True
+
+
+class JsonCaseStore(CaseStore):
+    """
+    Case store backed by a single JSON file.
+
+    The file is parsed once and only re-parsed when its mtime or size changes,
+    e.g. because another process edited it.
+    """
+
+    def __init__(self, path: str, embeddings: EmbeddingMatrix):
+        super().__init__(embeddings)
+        self.path = path
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _is_stale(self) -> bool:
+        return self._stat() != self._signature
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r") as f:
+                cases = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            # If there's a problem with the file, reinitialize it
+            cases = {}
+            self._write(cases)
+        self._signature = self._stat()
+        return cases
+
+    def _write(self, cases: Dict[str, dict]) -> None:
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cases, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._signature = self._stat()
+
+    def _persist(self, case_id: str, case_data: dict, cases: Dict[str, dict]) -> None:
+        self._write(cases)
+
+    def _persist_all(self, cases: Dict[str, dict]) -> None:
+        self._write(cases)
+
+    def _persist_delete(self, case_id: str, cases: Dict[str, dict]) -> None:
+        self._write(cases)
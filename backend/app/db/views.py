@@ -0,0 +1,161 @@
+import bisect
+import heapq
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.db.store import CaseView
+
+# Fields of CaseSummary plus the columns the case table renders
+SUMMARY_FIELDS = ["id", "title", "status", "jurisdiction", "caseType", "date"]
+SUMMARY_NESTED_FIELDS = {
+    "brandImpactEstimate": ["impact"],
+    "caseWinLikelihood": ["percentage", "likelihood"],
+}
+
+# A subset of at least 1/SUBSET_WALK_RATIO of the cases is paged by walking the sorted list
+SUBSET_WALK_RATIO = 8
+
+
+def summarize_case(case: dict) -> dict:
+    """Project a full case onto the lightweight fields used by the case list"""
+    summary = {field: case.get(field) for field in SUMMARY_FIELDS}
+    for field, keys in SUMMARY_NESTED_FIELDS.items():
+        value = case.get(field)
+        if isinstance(value, dict):
+            summary[field] = {key: value[key] for key in keys if key in value}
+        else:
+            summary[field] = None
+    return summary
+
+
+class SummaryView(CaseView):
+    """
+    Precomputed summary projection of every case, in store order.
+
+    The case ids are also kept in a list, so a page is a list slice instead
+    of a walk past every case before the offset.
+    """
+
+    def __init__(self):
+        self._summaries: Dict[str, dict] = {}
+        self._order: List[str] = []
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self._summaries = {case_id: summarize_case(case) for case_id, case in cases.items()}
+        self._order = list(self._summaries)
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if case_id not in self._summaries:
+            self._order.append(case_id)
+        self._summaries[case_id] = summarize_case(new)
+
+    def remove(self, case_id: str, old: dict) -> None:
+        if self._summaries.pop(case_id, None) is not None:
+            self._order.remove(case_id)
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def all(self) -> List[dict]:
+        return list(self._summaries.values())
+
+    def get(self, case_id: str) -> Optional[dict]:
+        return self._summaries.get(case_id)
+
+    def slice(self, offset: int, limit: Optional[int]) -> List[dict]:
+        end = None if limit is None else offset + limit
+        return [self._summaries[case_id] for case_id in self._order[offset:end]]
+
+
+class SortedIndexView(CaseView):
+    """
+    One sorted (value, case_id) list per sortable field.
+
+    Inserts and updates move a single entry with bisect, and a page is a
+    slice of the list, so paging through the corpus in any supported
+    order never sorts or scans it. A page of a subset, e.g. search
+    matches, is read from the same lists.
+    """
+
+    def __init__(self, fields: List[str]):
+        self.fields = fields
+        self._entries: Dict[str, List[Tuple[str, str]]] = {field: [] for field in fields}
+        self._keys: Dict[str, Dict[str, str]] = {field: {} for field in fields}
+
+    @staticmethod
+    def sort_key(case: dict, field: str) -> str:
+        """The value a case is sorted by for a field"""
+        value = case.get(field)
+        return "" if value is None else str(value)
+
+    def reset(self, cases: Dict[str, dict]) -> None:
+        self._keys = {
+            field: {case_id: self.sort_key(case, field) for case_id, case in cases.items()}
+            for field in self.fields
+        }
+        self._entries = {
+            field: sorted((key, case_id) for case_id, key in self._keys[field].items())
+            for field in self.fields
+        }
+
+    def upsert(self, case_id: str, old: Optional[dict], new: dict) -> None:
+        if old is not None:
+            self.remove(case_id, old)
+        for field, entries in self._entries.items():
+            key = self.sort_key(new, field)
+            self._keys[field][case_id] = key
+            bisect.insort(entries, (key, case_id))
+
+    def remove(self, case_id: str, old: dict) -> None:
+        for field, entries in self._entries.items():
+            entry = (self._keys[field].pop(case_id, self.sort_key(old, field)), case_id)
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def page(self, field: str, descending: bool, offset: int, limit: Optional[int]) -> List[str]:
+        """Case ids of one page in the order of the given field"""
+        entries = self._entries[field]
+        if descending:
+            end = max(len(entries) - offset, 0)
+            start = 0 if limit is None else max(end - limit, 0)
+            return [case_id for _, case_id in reversed(entries[start:end])]
+        end = None if limit is None else offset + limit
+        return [case_id for _, case_id in entries[offset:end]]
+
+    def page_of(
+        self,
+        field: str,
+        case_ids: Set[str],
+        descending: bool,
+        offset: int,
+        limit: Optional[int],
+    ) -> List[str]:
+        """
+        Case ids of one page of a subset of the cases, in the order of the given field
+
+        A subset covering a good part of the corpus is read by walking the
+        sorted list until the page is full. A smaller one is located in the
+        list by bisecting for each of its cases, and only the positions up
+        to the end of the page are selected, with a heap.
+        """
+        entries = self._entries[field]
+        end = None if limit is None else offset + limit
+        if len(case_ids) * SUBSET_WALK_RATIO >= len(entries):
+            ordered = reversed(entries) if descending else iter(entries)
+            matches = (case_id for _, case_id in ordered if case_id in case_ids)
+            return list(itertools.islice(matches, offset, end))
+
+        keys = self._keys[field]
+        positions = [
+            bisect.bisect_left(entries, (keys[case_id], case_id))
+            for case_id in case_ids
+            if case_id in keys
+        ]
+        if end is None:
+            positions.sort(reverse=descending)
+        elif descending:
+            positions = heapq.nlargest(end, positions)
+        else:
+            positions = heapq.nsmallest(end, positions)
+        return [entries[position][1] for position in positions[offset:]]
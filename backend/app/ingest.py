@@ -0,0 +1,647 @@
+"""
+Case ingestion pipeline and the worker threads that run it.
+
+POST /api/cases/ only spools the uploaded documents to disk and queues an
+ingestion job. Worker threads started with the app claim queued jobs and run
+the slow part: text extraction, the LLM extractors, embedding, similar-case
+search and the win-likelihood prediction. Progress is recorded on the job.
+"""
+import io
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import PyPDF2
+from fastapi import UploadFile
+
+from app.clients.embed import embed, find_similar
+from app.clients.extract_case_type import extract_case_type
+from app.clients.extract_other_types import extract_other_types, failed_chunks
+from app.clients.prediction import add_win_likelihood_to_case
+from app.db.database import (
+    INGEST_RETRY_DELAY,
+    UPLOADS_DIR,
+    add_new_case,
+    get_case_by_id,
+    get_job_queue,
+)
+from app.db.jobs import JobQueue
+
+# Called with the name of the stage a job enters and the fraction done
+ProgressCallback = Callable[[str, float], None]
+
+# Case fields written by add_win_likelihood_to_case
+PREDICTION_FIELDS = ["caseWinLikelihood", "defenseArgumentation"]
+
+# Payload key of a completion job, the ID of the ingestion job it completes
+COMPLETES = "completes"
+
+
+def extract_text_from_file(file_content: bytes, filename: str) -> str:
+    """Extract text from files, supporting PDF and text files."""
+    extracted_text = ""
+
+    try:
+        if filename.lower().endswith(".pdf"):
+            # For PDF files, use PyPDF2
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+            for page_num in range(len(pdf_reader.pages)):
+                page = pdf_reader.pages[page_num]
+                extracted_text += page.extract_text() + "\n"
+        elif filename.lower().endswith((".txt", ".md", ".rtf")):
+            # For text files, decode the content
+            extracted_text = file_content.decode("utf-8", errors="ignore")
+        else:
+            # For unsupported file types
+            extracted_text = f"[Content extraction not supported for {filename}]"
+    except Exception as e:
+        extracted_text = f"[Error extracting text from {filename}: {str(e)}]"
+
+    return extracted_text
+
+async def spool_uploads(case_id: str, files: Optional[List[UploadFile]]) -> dict:
+    """
+    Save uploaded files to disk so an ingestion job can read them later
+
+    Args:
+        case_id: The ID of the case being created, names the spool directory
+        files: The uploaded files
+
+    Returns:
+        dict: Job payload with the spool directory and the saved files
+    """
+    spool_dir = os.path.join(UPLOADS_DIR, case_id)
+    os.makedirs(spool_dir, exist_ok=True)
+    spooled = []
+    for index, file in enumerate(files or []):
+        filename = file.filename or f"upload-{index}"
+        # Keep the name for display and type detection, not as a path
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename))
+        path = os.path.join(spool_dir, f"{index}_{safe_name}")
+        with open(path, "wb") as f:
+            f.write(await file.read())
+        spooled.append({"path": path, "filename": filename})
+    return {"dir": spool_dir, "files": spooled}
+
+
+def extract_text(files: List[dict]) -> str:
+    """Extract the text of spooled files, each under a header with its name"""
+    extracted_text = ""
+    for file in files:
+        try:
+            with open(file["path"], "rb") as f:
+                contents = f.read()
+
+            # Extract text from file
+            file_text = extract_text_from_file(contents, file["filename"])
+            extracted_text += f"--- From {file['filename']} ---\n{file_text}\n\n"
+        except Exception as e:
+            print(f"Error processing file {file['filename']}: {str(e)}")
+    return extracted_text
+
+
+def other_types_fields(extract_other_types_response) -> dict:
+    """
+    Turn the response of extract_other_types into case fields
+
+    Args:
+        extract_other_types_response: The case information extracted from the documents
+
+    Returns:
+        dict: The case fields it determines, e.g. status, jurisdiction,
+            filing date, timeline and the affected car and part
+    """
+    # Parse the data from extract_other_types_response
+    case_id_from_extract = extract_other_types_response.Case_ID
+    filing_date_raw = extract_other_types_response.Filing_Date
+    try:
+        # Try to parse the date assuming the format "YYYY-MM-DD"
+        filing_date_obj = datetime.strptime(filing_date_raw, "%Y-%m-%d")
+        filing_date = filing_date_obj.strftime("%Y-%m-%d")
+    except Exception:
+        filing_date = "Not specified"
+
+    # Handle the new jurisdiction format (now a dictionary)
+    jurisdiction = extract_other_types_response.Jurisdiction
+    state_jurisdiction = (
+        jurisdiction.get("state_jurisdiction", "Not specified")
+        if isinstance(jurisdiction, dict)
+        else "Not specified"
+    )
+    court_jurisdiction = (
+        jurisdiction.get("court_jurisdiction", "Not specified")
+        if isinstance(jurisdiction, dict)
+        else jurisdiction
+    )
+
+    defect_type = extract_other_types_response.Defect_Type or []
+    number_of_claimants = str(extract_other_types_response.Number_of_Claimants)
+    media_coverage_level = extract_other_types_response.Media_Coverage_Level
+    outcome = extract_other_types_response.Outcome
+
+    # Convert status to match the expected values from the new valid statuses
+    status_raw = extract_other_types_response.Status
+    valid_statuses = [
+        "In favour of defendant",
+        "In favour of plaintiff",
+        "Settled",
+        "In Progress first instance",
+        "Dismissed",
+        "In Progress appeal",
+        "In Progress Supreme Court",
+    ]
+
+    if isinstance(status_raw, str) and status_raw in valid_statuses:
+        status = status_raw
+    elif isinstance(status_raw, str) and status_raw == "Not specified":
+        status = "In Progress first instance"  # Default value
+    else:
+        status = "In Progress first instance"  # Default value
+
+    case_summary = extract_other_types_response.Case_Summary
+    time_to_resolution_months = extract_other_types_response.Time_to_Resolution_Months
+    settlement_amount = extract_other_types_response.Settlement_Amount
+    defense_cost_estimate = extract_other_types_response.Defense_Cost_Estimate
+    expected_brand_impact = extract_other_types_response.Expected_Brand_Impact
+
+    # Parse the new and updated information from extract_other_types_response
+    affected_car = extract_other_types_response.Affected_Car
+    affected_part = extract_other_types_response.Affected_Part
+    brand_impact_estimate = extract_other_types_response.Brand_Impact_Estimate
+    case_win_likelihood = extract_other_types_response.Case_Win_Likelihood
+
+    # Get plaintiff argumentation as a list of key points
+    plaintiff_argumentation = extract_other_types_response.Plaintiff_Argumentation or []
+
+    # Get the new fields
+    timeline_of_events = extract_other_types_response.Timeline_of_Events or []
+    relevant_laws = extract_other_types_response.Relevant_Laws or []
+
+    # Get the separated reputation impact
+    reputation_impact = extract_other_types_response.Reputation_Impact or {
+        "case_outcome": {
+            "impact": "Not specified",
+            "explanation": "Insufficient information to determine",
+        },
+        "media_coverage": {
+            "impact": "Not specified",
+            "explanation": "Insufficient information to determine",
+        },
+    }
+
+    reputation_impact_case = reputation_impact.get("case_outcome", {})
+    reputation_impact_media = reputation_impact.get("media_coverage", {})
+
+    print("\nParsed Other Types Response:")
+    print(f"Case ID: {case_id_from_extract}")
+    print(f"Filing Date: {filing_date}")
+    print(f"State Jurisdiction: {state_jurisdiction}")
+    print(f"Court Jurisdiction: {court_jurisdiction}")
+    print(f"Defect Type: {defect_type}")
+    print(f"Number of Claimants: {number_of_claimants}")
+    print(f"Media Coverage Level: {media_coverage_level}")
+    print(f"Outcome: {outcome}")
+    print(f"Status: {status}")
+    print(f"Case Summary: {case_summary}")
+    print(f"Time to Resolution (Months): {time_to_resolution_months}")
+    print(f"Settlement Amount: {settlement_amount}")
+    print(f"Defense Cost Estimate: {defense_cost_estimate}")
+    print(f"Expected Brand Impact: {expected_brand_impact}")
+
+    # Print the new and updated information
+    print("\nNew and Updated Information:")
+    print(f"Affected Car: {affected_car}")
+    print(f"Affected Part: {affected_part}")
+    print(f"Brand Impact Estimate: {brand_impact_estimate}")
+    print(f"Case Win Likelihood: {case_win_likelihood}")
+    print(f"Plaintiff Argumentation: {plaintiff_argumentation}")
+    print(f"Timeline of Events: {timeline_of_events}")
+    print(f"Relevant Laws: {relevant_laws}")
+    print(f"Reputation Impact (Case Outcome): {reputation_impact_case}")
+    print(f"Reputation Impact (Media Coverage): {reputation_impact_media}")
+
+    # Generate case metadata from extracted text
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    # Function to extract date from timeline event string
+    def extract_date_from_event(event_str):
+        """
+        Extract date from event string using various patterns.
+        Returns the date in YYYY-MM-DD format if found, otherwise None.
+        """
+        import re
+        from datetime import datetime
+
+        # Common date patterns
+        patterns = [
+            # YYYY-MM-DD
+            r"(\d{4}-\d{1,2}-\d{1,2})",
+            # MM/DD/YYYY
+            r"(\d{1,2}/\d{1,2}/\d{4})",
+            # Month DD, YYYY
+            r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}",
+            # DD Month YYYY
+            r"(\d{1,2}\s+(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4})",
+            # Month YYYY
+            r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}",
+        ]
+
+        for pattern in patterns:
+            match = re.search(pattern, event_str)
+            if match:
+                date_str = match.group(0)
+                try:
+                    # Try various date formats
+                    for fmt in (
+                        "%Y-%m-%d",
+                        "%m/%d/%Y",
+                        "%B %d, %Y",
+                        "%d %B %Y",
+                        "%B %Y",
+                    ):
+                        try:
+                            date_obj = datetime.strptime(date_str, fmt)
+                            # If only month and year, set day to 1
+                            if fmt == "%B %Y":
+                                return date_obj.strftime("%Y-%m-01")
+                            return date_obj.strftime("%Y-%m-%d")
+                        except ValueError:
+                            continue
+                except Exception:
+                    pass
+
+        # If no date pattern found or parsing failed
+        return None
+
+    # Process timeline events to extract dates
+    processed_timeline = []
+
+    # Process the extracted timeline events
+    for event in timeline_of_events:
+        if event != "Not specified":
+            # Try to extract a date from the event text
+            event_date = extract_date_from_event(event)
+
+            # If filing_date is available and no date found in the event,
+            # use filing_date for events that seem to be about the filing
+            if not event_date and filing_date and filing_date != "Not specified":
+                if any(
+                    filing_term in event.lower()
+                    for filing_term in [
+                        "filed",
+                        "filing",
+                        "complaint",
+                        "initiated",
+                        "commenced",
+                    ]
+                ):
+                    event_date = filing_date
+
+            # Add the event to the timeline with the extracted date or "Unknown"
+            processed_timeline.append(
+                {
+                    "date": event_date if event_date else "Unknown",
+                    "event": event,
+                    "description": "",
+                }
+            )
+
+    if filing_date == "Not specified":
+        for event in processed_timeline:
+            if event["date"] != "Unknown":
+                filing_date = event["date"]
+                break
+
+    return {
+        "status": status,
+        "jurisdiction": f"{state_jurisdiction} - {court_jurisdiction}",  # Keep the jurisdiction field for backward compatibility
+        "stateJurisdiction": state_jurisdiction,
+        "courtJurisdiction": court_jurisdiction,
+        "date": filing_date,
+        "relevantLaws": relevant_laws if relevant_laws != ["Not specified"] else [],
+        "timeline": processed_timeline,
+        "plaintiffArgumentation": (
+            plaintiff_argumentation
+            if plaintiff_argumentation != ["Not specified"]
+            else []
+        ),
+        "numberOfClaimants": number_of_claimants,
+        "mediaCoverageLevel": media_coverage_level,
+        "outcome": outcome,
+        "caseSummary": case_summary,
+        "timeToResolutionMonths": time_to_resolution_months,
+        "settlementAmount": settlement_amount,
+        "defenseCostEstimate": defense_cost_estimate,
+        "expectedBrandImpact": expected_brand_impact,
+        "affectedCar": affected_car,
+        "affectedPart": affected_part,
+        "brandImpactEstimate": brand_impact_estimate,
+        "caseWinLikelihood": case_win_likelihood,
+        "reputationImpactCase": reputation_impact_case,
+        "reputationImpactMedia": reputation_impact_media,
+    }
+
+
+def build_case(case_id: str, extracted_text: str, progress: ProgressCallback) -> dict:
+    """
+    Turn the text of the case documents into a case record
+
+    Args:
+        case_id: The ID of the new case
+        extracted_text: The text of all uploaded documents
+        progress: Called whenever the pipeline enters a new stage
+
+    Returns:
+        dict: The new case, with embedding, similar cases and win likelihood
+    """
+    print(extracted_text)
+
+    # Both extractors only need the text, so they run side by side
+    progress("extracting", 0.1)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        case_type_future = pool.submit(extract_case_type, extracted_text)
+        other_types_future = pool.submit(extract_other_types, extracted_text)
+        extract_case_type_response = case_type_future.result()
+        extract_other_types_response = other_types_future.result()
+
+    print(extract_case_type_response)
+    print(extract_other_types_response)
+
+    print("Extracted Case Type Response:")
+
+    # Parse the data from extract_case_type_response
+    case_type = extract_case_type_response.primary_analysis.case_type
+    harm_type = extract_case_type_response.primary_analysis.harm_type
+    cause = extract_case_type_response.primary_analysis.cause
+    description = extract_case_type_response.primary_analysis.description
+    secondary_types = extract_case_type_response.primary_analysis.secondary_types or []
+
+    # Extract evidence from the primary analysis
+    evidence = extract_case_type_response.primary_analysis.evidence or []
+
+    # Parse possible alternatives from extract_case_type_response
+    possible_alternatives = extract_case_type_response.possible_alternatives or []
+
+    # Extract evidence from possible alternatives if available
+    for alt in possible_alternatives:
+        if hasattr(alt, "evidence") and alt.evidence:
+            # Add evidence from alternatives to a separate field if needed
+            alt_evidence = alt.evidence
+        else:
+            alt_evidence = []
+
+    # Print parsed variables for debugging (optional)
+    print("Parsed Case Type Response:")
+    print(f"Case Type: {case_type}")
+    print(f"Harm Type: {harm_type}")
+    print(f"Cause: {cause}")
+    print(f"Description: {description}")
+    print(f"Secondary Types: {secondary_types}")
+    print(f"Evidence: {evidence}")
+    print(f"Possible Alternatives: {possible_alternatives}")
+
+    # Process evidence for storage in the database
+    processed_evidence = []
+    if evidence:
+        for item in evidence:
+            processed_evidence.append(
+                {
+                    "text": (
+                        item.text if hasattr(item, "text") else item.get("text", "")
+                    ),
+                    "relevance": (
+                        item.relevance
+                        if hasattr(item, "relevance")
+                        else item.get("relevance", "")
+                    ),
+                    "strength": (
+                        item.strength
+                        if hasattr(item, "strength")
+                        else item.get("strength", "")
+                    ),
+                }
+            )
+
+    # Create a new case object with updated field names
+    new_case = {
+        "id": case_id,
+        "title": case_id,
+        "caseType": case_type,
+        "harmType": harm_type,
+        "cause": cause,
+        "description": description,
+        "secondaryTypes": secondary_types,
+        "possibleAlternatives": possible_alternatives,
+        "evidence": processed_evidence,  # Add the evidence to the case
+        **other_types_fields(extract_other_types_response),
+        "defenseArgumentation": "",
+        "suggestions": [],
+    }
+
+
+    # The prediction and the embedding branch need the extracted case, not
+    # each other. The prediction runs on a copy and only its fields are taken.
+    progress("embedding_and_predicting", 0.6)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        prediction_future = pool.submit(add_win_likelihood_to_case, dict(new_case))
+        new_case = embed(new_case)
+        new_case = find_similar(new_case, threshold=0.5, top_k=5)
+        predicted_case = prediction_future.result()
+    for field in PREDICTION_FIELDS:
+        if field in predicted_case:
+            new_case[field] = predicted_case[field]
+    return new_case
+
+
+class IncompleteExtraction(Exception):
+    """The case was saved, but some chunks of its documents could not be extracted"""
+
+    def __init__(self, chunks: List[int]):
+        self.chunks = chunks
+        super().__init__(f"Chunks {chunks} of the documents could not be extracted")
+
+
+def run_job(job: dict, progress: ProgressCallback) -> None:
+    """
+    Run the ingestion pipeline for a claimed job and store the new case
+
+    Raises:
+        IncompleteExtraction: If some document chunks failed. The case is
+            saved without their facts and the spooled files are kept for
+            a completion job, see complete_job.
+    """
+    progress("extracting_text", 0.05)
+    extracted_text = extract_text(job["payload"]["files"])
+    new_case = build_case(job["caseId"], extracted_text, progress)
+
+    # Add the case to the database
+    progress("saving", 0.95)
+    if not add_new_case(job["caseId"], new_case):
+        raise RuntimeError("Failed to create case")
+    failed = failed_chunks(extracted_text)
+    if failed:
+        raise IncompleteExtraction(failed)
+    shutil.rmtree(job["payload"]["dir"], ignore_errors=True)
+
+
+def complete_case(case_id: str, extracted_text: str, progress: ProgressCallback) -> None:
+    """
+    Extract the failed chunks of a saved case again and merge them into it
+
+    Only extract_other_types runs again, and it only calls the LLM for the
+    chunks that failed before. The fields it determines replace those of
+    the stored case, whose case type and prediction are kept, and the case
+    is embedded again since its text changed.
+
+    Args:
+        case_id: The ID of the saved case
+        extracted_text: The text of its documents
+        progress: Called whenever the completion enters a new stage
+    """
+    progress("extracting", 0.1)
+    fields = other_types_fields(extract_other_types(extracted_text))
+
+    stored = get_case_by_id(case_id)
+    if stored is None:
+        raise RuntimeError(f"Case {case_id} no longer exists")
+    case = dict(stored)
+    case.update({field: value for field, value in fields.items() if field not in PREDICTION_FIELDS})
+
+    progress("embedding", 0.6)
+    case = embed(case)
+
+    progress("saving", 0.95)
+    if not add_new_case(case_id, case):
+        raise RuntimeError("Failed to update case")
+
+
+def complete_job(job: dict, progress: ProgressCallback, last_attempt: bool) -> None:
+    """
+    Run a completion job, queued when an ingestion job left chunks unextracted
+
+    The spooled files are removed once every chunk is extracted, the job
+    fails, or this is its last attempt.
+
+    Raises:
+        IncompleteExtraction: If some chunks failed again
+    """
+    failed: List[int] = []
+    try:
+        progress("extracting_text", 0.05)
+        extracted_text = extract_text(job["payload"]["files"])
+        if failed_chunks(extracted_text):
+            complete_case(job["caseId"], extracted_text, progress)
+        failed = failed_chunks(extracted_text)
+        if failed:
+            raise IncompleteExtraction(failed)
+    finally:
+        if not failed or last_attempt:
+            shutil.rmtree(job["payload"]["dir"], ignore_errors=True)
+
+
+class IngestionWorkers:
+    """
+    Worker threads that run queued ingestion jobs.
+
+    A failed job keeps its spooled files, so it can be inspected or queued
+    again. A job whose documents were only partly extracted is done once
+    its case is saved, with the failed chunks noted in its error, and a
+    completion job is queued to extract them after INGEST_RETRY_DELAY.
+    The completion job is retried with the same delay until it runs out
+    of attempts.
+
+    A heartbeat thread keeps the jobs of this process alive in the queue
+    and takes back the jobs of processes that stopped, so several app
+    processes can share one queue.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 1):
+        self.queue = queue
+        self.workers = workers
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Requeue jobs interrupted by a restart and start the worker threads"""
+        self._recover()
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._beat, name="ingest-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop claiming new jobs
+
+        A job still running after the timeout is left behind and requeued
+        once its heartbeat is stale.
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _recover(self) -> None:
+        requeued = self.queue.recover()
+        if requeued:
+            print(f"Requeued {len(requeued)} interrupted ingestion jobs")
+
+    def _beat(self) -> None:
+        while not self._stopping.wait(self.queue.stale_after / 4):
+            try:
+                self.queue.heartbeat()
+                self._recover()
+            except Exception as e:
+                print(f"Ingestion job heartbeat failed: {e}")
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            job = self.queue.claim(timeout=1.0)
+            if job is None:
+                continue
+
+            def progress(stage: str, fraction: float, job_id: str = job["id"]) -> None:
+                self.queue.update(job_id, stage, fraction)
+
+            completes = job["payload"].get(COMPLETES)
+            try:
+                if completes:
+                    complete_job(job, progress, job["attempts"] >= self.queue.max_attempts)
+                else:
+                    run_job(job, progress)
+                self.queue.finish(job["id"])
+            except IncompleteExtraction as e:
+                self._incomplete(job, e, completes)
+            except Exception as e:
+                print(f"Ingestion job {job['id']} failed: {e}")
+                self.queue.fail(job["id"], str(e))
+
+    def _incomplete(self, job: dict, error: IncompleteExtraction, completes: Optional[str]) -> None:
+        """Finish a job that saved its case without some chunks and schedule their extraction"""
+        if not completes:
+            # The case is saved, so the job is done; the chunks are extracted later
+            completion = self.queue.enqueue(
+                job["caseId"],
+                {**job["payload"], COMPLETES: job["id"]},
+                delay=INGEST_RETRY_DELAY,
+            )
+            print(f"Ingestion job {job['id']} saved an incomplete case: {error}")
+            print(f"Completion job {completion['id']} will extract the failed chunks")
+            self.queue.finish(job["id"], error=f"{error}, they will be extracted again in the background")
+        elif self.queue.retry(job["id"], str(error), INGEST_RETRY_DELAY):
+            print(f"Completion job {job['id']} will run again: {error}")
+        else:
+            print(f"Completion job {job['id']} is out of attempts: {error}")
+            self.queue.finish(job["id"], error=str(error))
+
+
+def create_workers(workers: int = 1) -> IngestionWorkers:
+    """Create the ingestion workers for the process-wide job queue"""
+    return IngestionWorkers(get_job_queue(), workers)
@@ -0,0 +1,146 @@
+import gzip
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.db.database import get_data_version
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional, responses fall back to gzip without it
+    brotli = None
+
+# Separates the data version from the content encoding in an ETag
+ENCODING_SEPARATOR = "+"
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _matching_tag(if_none_match: str, etag: str) -> Optional[str]:
+    """
+    The If-None-Match entry that matches an ETag, if any
+
+    Tags of compressed variants carry an encoding suffix and match the ETag
+    of the data version they were generated from. "*" is not matched here,
+    see ETagMiddleware.
+    """
+    version = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        opaque = tag.removeprefix("W/").strip('"')
+        if opaque.split(ENCODING_SEPARATOR)[0] == version:
+            return tag
+    return None
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+class ETagMiddleware(BaseHTTPMiddleware):
+    """
+    Strong ETags for read-only API responses, derived from the data version.
+
+    Every GET below one of the prefixes gets the current data version as
+    ETag. A request whose If-None-Match carries it is answered with 304
+    without running the route, since nothing it could return has changed.
+    "If-None-Match: *" only matches a resource that exists, so the route
+    runs and only a successful response is turned into a 304.
+    """
+
+    def __init__(self, app, prefixes: Iterable[str]):
+        super().__init__(app)
+        self.prefixes = tuple(prefixes)
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method not in ("GET", "HEAD") or not request.url.path.startswith(self.prefixes):
+            return await call_next(request)
+
+        # The version stats the storage files, keep that off the event loop
+        etag = f'"{await run_in_threadpool(get_data_version)}"'
+        if_none_match = request.headers.get("if-none-match", "")
+        tag = _matching_tag(if_none_match, etag)
+        if tag is not None:
+            # Echo the client's tag, it names the variant the client has cached
+            return _not_modified(tag)
+
+        response = await call_next(request)
+        if 200 <= response.status_code < 300 and "*" in (
+            tag.strip() for tag in if_none_match.split(",")
+        ):
+            return _not_modified(response.headers.get("etag", etag))
+        if response.status_code == 200 and "etag" not in response.headers:
+            response.headers["ETag"] = etag
+            # Cache, but revalidate on every use
+            response.headers.setdefault("Cache-Control", "no-cache")
+        return response
+
+
+class CompressionMiddleware(BaseHTTPMiddleware):
+    """
+    Brotli or gzip compression of text responses above a size threshold.
+
+    Brotli is preferred when the client accepts it and the brotli package
+    is installed. Small bodies are sent as-is, compressing them costs more
+    than it saves.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        super().__init__(app)
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    @staticmethod
+    def _encoding(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for token in accept_encoding.lower().split(","):
+            name, _, params = token.partition(";")
+            try:
+                if params and float(params.strip().removeprefix("q=")) == 0:
+                    continue
+            except ValueError:
+                pass
+            accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        content_type = response.headers.get("content-type", "")
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or "content-encoding" in response.headers
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = dict(response.headers)
+        headers["vary"] = "Accept-Encoding"
+        encoding = self._encoding(request.headers.get("accept-encoding", ""))
+        if encoding is not None and len(body) >= self.minimum_size:
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["content-encoding"] = encoding
+            headers.pop("content-length", None)
+            etag = headers.get("etag")
+            if etag and etag.startswith('"'):
+                # A strong ETag names exact bytes, so each encoding gets its own
+                headers["etag"] = f'{etag[:-1]}{ENCODING_SEPARATOR}{encoding}"'
+        return Response(content=body, status_code=response.status_code, headers=headers)
@@ -70,6 +70,11 @@ class CaseSummary(BaseModel):
     date: str
 
 
+class SimilarCase(BaseModel):
+    id: str
+    score: float
+
+
 class TrendStats(BaseModel):
     totalCases: int
     wonCases: int
@@ -95,6 +100,31 @@ class StatusStats(BaseModel):
     count: int
 
 
+class JurisdictionStats(BaseModel):
+    jurisdiction: str
+    count: int
+
+
+class TimeSeriesGroup(BaseModel):
+    group: str
+    counts: List[int]
+
+
+class TimeSeriesStats(BaseModel):
+    bucket: str
+    groupBy: str
+    buckets: List[str]
+    series: List[TimeSeriesGroup]
+
+
+class DashboardStats(BaseModel):
+    stats: TrendStats
+    cars: List[CarStats]
+    parts: List[PartStats]
+    status: List[StatusStats]
+    jurisdictions: List[JurisdictionStats]
+
+
 class CreateCaseRequest(BaseModel):
     title: str
     status: Literal[
@@ -117,3 +147,43 @@ class CreateCaseRequest(BaseModel):
 
 class CaseResponse(BaseModel):
     id: str
+    jobId: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    id: str
+    caseId: str
+    status: Literal["queued", "running", "done", "failed"]
+    stage: str
+    progress: float
+    attempts: int
+    error: Optional[str] = None
+    createdAt: float
+    updatedAt: float
+
+
+class LLMCallMetrics(BaseModel):
+    requests: int
+    attempts: int
+    retries: int
+    failed: int
+    timeouts: int
+    tokensUsed: int
+    tokensWasted: int
+    throttled: int
+    concurrency: int
+    inFlight: int
+
+
+class ChunkMetrics(BaseModel):
+    documents: int
+    extractedChunks: int
+    failedChunks: int
+    documentsWithFailedChunks: int
+    rerunChunks: int
+    reusedChunks: int
+
+
+class Metrics(BaseModel):
+    llm: LLMCallMetrics
+    chunks: ChunkMetrics
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+
+from app.db.database import get_job
+from app.models.models import JobStatus
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """
+    Get the status and progress of a case ingestion job
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
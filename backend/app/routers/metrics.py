@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+
+from app.clients.llm import llm_client
+from app.db.database import get_chunk_results
+from app.models.models import Metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@router.get("/", response_model=Metrics)
+async def get_metrics():
+    """
+    Get LLM call metrics (retries, throttling, wasted tokens) and the
+    per-chunk extraction results, since the process started
+    """
+    limiter = llm_client.limiter.snapshot()
+    return {
+        "llm": {
+            **llm_client.metrics.snapshot(),
+            "throttled": limiter["throttled"],
+            "concurrency": limiter["concurrency"],
+            "inFlight": limiter["inFlight"],
+        },
+        "chunks": get_chunk_results().summary(),
+    }
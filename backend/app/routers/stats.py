@@ -1,13 +1,25 @@
-from fastapi import APIRouter
-from typing import List
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, List, Literal, Optional
+from datetime import date
 
 from app.db.database import (
     get_stats,
     get_car_stats,
     get_part_stats,
-    get_status_stats
+    get_status_stats,
+    get_jurisdiction_stats,
+    get_dashboard,
+    get_timeseries,
+)
+from app.models.models import (
+    TrendStats,
+    CarStats,
+    PartStats,
+    StatusStats,
+    JurisdictionStats,
+    DashboardStats,
+    TimeSeriesStats,
 )
-from app.models.models import TrendStats, CarStats, PartStats, StatusStats
 
 router = APIRouter(
     prefix="/stats",
@@ -15,30 +27,82 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+
+def stats_filters(
+    affectedCar: Optional[str] = Query(None, description="Only cases with this car"),
+    affectedPart: Optional[str] = Query(None, description="Only cases with this part"),
+    stateJurisdiction: Optional[str] = Query(None, description="Only cases in this state"),
+    caseType: Optional[str] = Query(None, description="Only cases of this type"),
+    status: Optional[str] = Query(None, description="Only cases with this status"),
+    date_from: Optional[date] = Query(None, description="Earliest filing date, inclusive"),
+    date_to: Optional[date] = Query(None, description="Latest filing date, inclusive"),
+) -> Dict[str, str]:
+    """Collect the stats filter query parameters that were given"""
+    filters = {
+        "affectedCar": affectedCar,
+        "affectedPart": affectedPart,
+        "stateJurisdiction": stateJurisdiction,
+        "caseType": caseType,
+        "status": status,
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None,
+    }
+    return {key: value for key, value in filters.items() if value is not None}
+
 @router.get("/", response_model=TrendStats)
-async def get_trend_stats():
+async def get_trend_stats(filters: Dict[str, str] = Depends(stats_filters)):
     """
     Get overall case statistics for trends dashboard
     """
-    return get_stats()
+    return get_stats(filters)
 
 @router.get("/cars", response_model=List[CarStats])
-async def get_car_statistics():
+async def get_car_statistics(filters: Dict[str, str] = Depends(stats_filters)):
     """
     Get statistics about affected car models
     """
-    return get_car_stats()
+    return get_car_stats(filters)
 
 @router.get("/parts", response_model=List[PartStats])
-async def get_part_statistics():
+async def get_part_statistics(filters: Dict[str, str] = Depends(stats_filters)):
     """
     Get statistics about affected car parts
     """
-    return get_part_stats()
+    return get_part_stats(filters)
 
 @router.get("/status", response_model=List[StatusStats])
-async def get_status_statistics():
+async def get_status_statistics(filters: Dict[str, str] = Depends(stats_filters)):
     """
     Get statistics about case statuses
     """
-    return get_status_stats()
\ No newline at end of file
+    return get_status_stats(filters)
+
+@router.get("/jurisdictions", response_model=List[JurisdictionStats])
+async def get_jurisdiction_statistics(filters: Dict[str, str] = Depends(stats_filters)):
+    """
+    Get statistics about the state jurisdictions of cases
+    """
+    return get_jurisdiction_stats(filters)
+
+@router.get("/dashboard", response_model=DashboardStats)
+async def get_dashboard_statistics(filters: Dict[str, str] = Depends(stats_filters)):
+    """
+    Get all trends dashboard statistics in one response
+    """
+    return get_dashboard(filters)
+
+
+@router.get("/timeseries", response_model=TimeSeriesStats)
+async def get_timeseries_statistics(
+    bucket: Literal["month", "quarter", "year"] = Query(
+        "month", description="Time bucket size"
+    ),
+    group_by: Literal["affectedPart", "affectedCar", "status", "caseType"] = Query(
+        "affectedPart", description="Field to split the counts by"
+    ),
+    filters: Dict[str, str] = Depends(stats_filters),
+):
+    """
+    Get case counts per filing date bucket, split by a case field
+    """
+    return get_timeseries(bucket=bucket, group_by=group_by, filters=filters)
@@ -1,11 +1,62 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import cases, stats
+from fastapi.concurrency import run_in_threadpool
+from app.routers import cases, jobs, metrics, stats
+from app.clients import embed
+from app.clients.llm import llm_client
+from app.db.database import INGEST_WORKERS, check_stats, warm_up_similarity_index
+from app.ingest import create_workers
+from app.middleware import CompressionMiddleware, ETagMiddleware
+
+# Seconds between checks of the running stats counters, 0 disables them
+STATS_CHECK_INTERVAL = float(os.environ.get("STATS_CHECK_INTERVAL", "3600"))
+
+
+async def check_stats_periodically(interval: float):
+    """Verify the stats counters of this process and rebuild them if they drifted"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(check_stats)
+        except Exception as e:
+            print(f"Error checking the statistics counters: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model once at startup instead of on the first case upload
+    if os.environ.get("EMBEDDING_WARMUP", "true").lower() == "true":
+        await run_in_threadpool(embed.warm_up)
+    # Train a missing similarity index now rather than in the first search
+    await run_in_threadpool(warm_up_similarity_index)
+    # Run queued case ingestion jobs off the event loop
+    workers = create_workers(INGEST_WORKERS)
+    workers.start()
+    stats_check = None
+    if STATS_CHECK_INTERVAL > 0:
+        stats_check = asyncio.create_task(check_stats_periodically(STATS_CHECK_INTERVAL))
+    yield
+    if stats_check is not None:
+        stats_check.cancel()
+    workers.stop()
+    await llm_client.aclose()
+
 
 app = FastAPI(
     title="Bayerische Datenwerke API",
     description="API for legal case management",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Revalidate case and stats reads against the data version, 304 if unchanged
+app.add_middleware(ETagMiddleware, prefixes=["/api/cases", "/api/stats"])
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
 )
 
 # Configure CORS to allow requests from the frontend
@@ -15,11 +66,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "ETag"],
 )
 
 # Include routers
 app.include_router(cases.router, prefix="/api")
 app.include_router(stats.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 @app.get("/")
 async def root():
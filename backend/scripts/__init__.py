@@ -0,0 +1 @@
+# Initialize the scripts package
\ No newline at end of file
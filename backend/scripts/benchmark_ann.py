@@ -0,0 +1,97 @@
+"""
+Compare the IVF similarity index against exact search.
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_ann [--rows 10000] [--dim 1024] [--queries 200] [--k 5]
+    python -m scripts.benchmark_ann --live
+
+By default the benchmark runs on synthetic clustered embeddings. With
+--live it runs on a copy of the stored case embeddings, using stored cases
+as queries. For every nprobe it reports recall@k against exact search and
+the mean latency per query.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.db.ann import IVFIndex
+from app.db.database import get_embeddings
+from app.db.embeddings import EmbeddingMatrix
+
+
+def synthetic_embeddings(rows, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    points = centers[labels] + 0.8 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def mean_latency_ms(search, queries):
+    started = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, 1000 * (time.perf_counter() - started) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF vs exact similarity search")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=None, help="IVF clusters")
+    parser.add_argument("--live", action="store_true", help="Use the stored case embeddings")
+    args = parser.parse_args()
+
+    if args.live:
+        _, matrix = get_embeddings().snapshot()
+        matrix = np.asarray(matrix)
+    else:
+        matrix = synthetic_embeddings(args.rows, args.dim, args.clusters)
+
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(matrix), min(args.queries, len(matrix)), replace=False)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        embeddings = EmbeddingMatrix(os.path.join(tmp_dir, "embeddings.npy"))
+        embeddings.put_many((str(row), vector) for row, vector in enumerate(matrix))
+        index = IVFIndex(embeddings, os.path.join(tmp_dir, "embeddings.ivf.npz"), min_rows=0)
+
+        started = time.perf_counter()
+        index.build(n_lists=args.n_lists)
+        print(
+            f"{len(matrix)} rows x {matrix.shape[1]} dims, "
+            f"{len(index._lists)} lists built in {time.perf_counter() - started:.2f}s"
+        )
+
+        def search_args(row):
+            return matrix[row], args.k, -1.0, [str(row)]
+
+        exact, exact_ms = mean_latency_ms(
+            lambda row: embeddings.top_k(*search_args(row)), query_rows
+        )
+        print(f"exact        recall@{args.k} 1.000  {exact_ms:7.2f} ms/query")
+
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > len(index._lists):
+                break
+            approx, approx_ms = mean_latency_ms(
+                lambda row: index.top_k(*search_args(row), nprobe=nprobe), query_rows
+            )
+            hits = sum(
+                len({case_id for case_id, _ in a} & {case_id for case_id, _ in e})
+                for a, e in zip(approx, exact)
+            )
+            total = sum(len(e) for e in exact) or 1
+            print(
+                f"ivf nprobe={nprobe:<3} recall@{args.k} {hits / total:.3f}  "
+                f"{approx_ms:7.2f} ms/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
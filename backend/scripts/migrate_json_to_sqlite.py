@@ -0,0 +1,28 @@
+"""
+One-shot migration of app/db/cases.json into the SQLite storage backend.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_json_to_sqlite [--json PATH] [--sqlite PATH]
+
+Afterwards set CASES_DB_BACKEND=sqlite to serve cases from the database.
+"""
+import argparse
+
+from app.db.database import CASES_DB_PATH, CASES_SQLITE_PATH, CASE_EMBEDDINGS_PATH
+from app.db.embeddings import EmbeddingMatrix
+from app.db.sqlite_store import SqliteCaseStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate cases.json into SQLite")
+    parser.add_argument("--json", default=CASES_DB_PATH, help="Source cases.json")
+    parser.add_argument("--sqlite", default=CASES_SQLITE_PATH, help="Target database")
+    args = parser.parse_args()
+
+    store = SqliteCaseStore(args.sqlite, EmbeddingMatrix(CASE_EMBEDDINGS_PATH))
+    count = store.import_json(args.json)
+    print(f"Imported {count} cases from {args.json} into {args.sqlite}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Recompute caseEmbedding for the whole corpus, e.g. after changing the text
+recipe in app/clients/embed.py.
+
+Usage (from the backend directory):
+    python -m scripts.reembed [--batch-size 32] [--chunk-size 256] [--workers 2] [--restart]
+
+Embeddings are written to a staging matrix next to the live one and a
+checkpoint records which cases are done, so an interrupted run resumes
+where it stopped. Worker threads build and tokenize the case texts of the
+next chunks while the main thread runs the model's forward passes, which
+only one thread at a time can do anyway.
+
+Before the staging matrix replaces the live one, the store is read again
+and cases created while the script ran are embedded as well. The swap is
+atomic, and the IVF similarity index is then retrained on the new vectors.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+import numpy as np
+
+from app.clients.embed import MODEL_NAME, TextBatch, case_text, embedding_model
+from app.db.database import get_embeddings, get_store, rebuild_similarity_index
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def grow_staging(path, rows):
+    """Copy the staging matrix into a larger one with rows more rows"""
+    staging = np.load(path, mmap_mode="r")
+    tmp_path = f"{path}.tmp.npy"
+    grown = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=staging.dtype,
+        shape=(staging.shape[0] + rows, staging.shape[1]),
+    )
+    grown[:staging.shape[0]] = staging
+    grown.flush()
+    del staging, grown
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r+")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed every stored case")
+    parser.add_argument("--batch-size", type=int, default=32, help="Cases per forward pass")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Cases per checkpoint")
+    parser.add_argument(
+        "--workers", type=int, default=2,
+        help="Threads building and tokenizing case texts while the model runs",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    store = get_store()
+    live = get_embeddings()
+    staging_path = os.path.splitext(live.path)[0] + ".reembed.npy"
+    checkpoint_path = os.path.splitext(live.path)[0] + ".reembed.json"
+
+    _, model, _ = embedding_model.get()
+    cases = {case["id"]: case for case in store.all()}
+
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint["model"] != MODEL_NAME:
+        parser.error(
+            f"Checkpoint was written for {checkpoint['model']}, rerun with --restart"
+        )
+
+    if checkpoint and os.path.exists(staging_path):
+        staging = np.load(staging_path, mmap_mode="r+")
+        print(f"Resuming: {len(checkpoint['done'])}/{len(checkpoint['ids'])} cases done")
+    else:
+        # Keep existing ids at their current rows so the live index stays
+        # valid against the new matrix while it is being swapped in
+        live_ids, live_matrix = live.snapshot()
+        known = set(live_ids)
+        plan = live_ids + [case_id for case_id in cases if case_id not in known]
+        staging = np.lib.format.open_memmap(
+            staging_path, mode="w+", dtype=np.float32,
+            shape=(len(plan), model.config.hidden_size),
+        )
+        # Embeddings of cases that no longer exist are carried over as-is
+        orphans = [row for row, case_id in enumerate(live_ids) if case_id not in cases]
+        staging[orphans] = live_matrix[orphans]
+        staging.flush()
+        checkpoint = {
+            "model": MODEL_NAME,
+            "ids": plan,
+            "done": [live_ids[row] for row in orphans],
+        }
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    rows = {case_id: row for row, case_id in enumerate(checkpoint["ids"])}
+    done = set(checkpoint["done"])
+    pending = [
+        case_id for case_id in checkpoint["ids"] if case_id not in done and case_id in cases
+    ]
+
+    def prepare_chunk(chunk_ids):
+        return chunk_ids, TextBatch([case_text(cases[case_id]) for case_id in chunk_ids])
+
+    started = time.perf_counter()
+    embedded_cases = 0
+    embedded_tokens = 0
+    while pending:
+        chunks = [pending[i:i + args.chunk_size] for i in range(0, len(pending), args.chunk_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for chunk_ids, batch in executor.map(prepare_chunk, chunks):
+                staging[[rows[case_id] for case_id in chunk_ids]] = batch.embed(args.batch_size)
+                staging.flush()
+                checkpoint["done"].extend(chunk_ids)
+                save_checkpoint(checkpoint_path, checkpoint)
+
+                embedded_cases += len(chunk_ids)
+                embedded_tokens += batch.tokens
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{len(checkpoint['done'])}/{len(checkpoint['ids'])} cases | "
+                    f"{embedded_cases / elapsed:.1f} cases/s | "
+                    f"{embedded_tokens / elapsed:.0f} tokens/s"
+                )
+
+        # Cases created while the script ran, e.g. by the server
+        cases = {case["id"]: case for case in store.all()}
+        pending = [case_id for case_id in cases if case_id not in rows]
+        # Ones the server already appended to the live matrix keep their row order
+        live_rows = {case_id: live.row_of(case_id) for case_id in pending}
+        pending.sort(key=lambda case_id: (live_rows[case_id] is None, live_rows[case_id] or 0))
+        if pending:
+            print(f"Embedding {len(pending)} cases created during the run")
+            del staging
+            staging = grow_staging(staging_path, len(pending))
+            for case_id in pending:
+                rows[case_id] = len(checkpoint["ids"])
+                checkpoint["ids"].append(case_id)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    del staging
+    live.install(checkpoint["ids"], staging_path)
+    os.remove(checkpoint_path)
+    print(f"Installed {len(checkpoint['ids'])} embeddings into {live.path}")
+
+    # The centroids were trained on the old vectors
+    if rebuild_similarity_index():
+        print("Rebuilt the similarity index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Test setup: the app keeps its data next to the code by default, so every
+path it writes to is pointed at a temporary directory before app modules
+are imported. LLM calls go to a fake endpoint that tests replace with an
+httpx.MockTransport.
+"""
+import os
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="case-tests-")
+
+os.environ.update(
+    {
+        "CASES_DB_BACKEND": "sqlite",
+        "CASES_SQLITE_PATH": os.path.join(DATA_DIR, "cases.sqlite3"),
+        "CASE_EMBEDDINGS_PATH": os.path.join(DATA_DIR, "case_embeddings.npy"),
+        "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(DATA_DIR, "jobs.sqlite3"),
+        "CHUNK_RESULTS_PATH": os.path.join(DATA_DIR, "chunk_results.sqlite3"),
+        "UPLOADS_DIR": os.path.join(DATA_DIR, "uploads"),
+        "DIMENSION_ALIASES_PATH": os.path.join(DATA_DIR, "dimension_aliases.json"),
+        "SIMILARITY_INDEX": "exact",
+        "INGEST_RETRY_DELAY": "0",
+        "EMBEDDING_WARMUP": "false",
+        "STATS_CHECK_INTERVAL": "0",
+        "AZURE_OPENAI_ENDPOINT": "http://llm.test/chat",
+        "AZURE_OPENAI_API_KEY": "test-key",
+        "LLM_RETRY_BASE_DELAY": "0",
+    }
+)
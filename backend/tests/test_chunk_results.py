@@ -0,0 +1,43 @@
+import time
+
+from app.db.chunk_results import ChunkResultStore
+
+
+def test_results_and_failures_per_document(tmp_path):
+    store = ChunkResultStore(str(tmp_path / "chunks.sqlite3"))
+    document = ChunkResultStore.key("some text", 5000, "1")
+
+    store.save(document, 1, {"Affected_Car": "X5"})
+    store.fail(document, 2, "no JSON in the response")
+    assert store.results(document) == {1: {"Affected_Car": "X5"}}
+    assert store.failed(document) == [2]
+
+    # A failed chunk that is extracted later is no longer failed
+    store.save(document, 2, {"Affected_Part": "Airbag"})
+    assert store.failed(document) == []
+    assert store.summary()["rerunChunks"] == 1
+
+
+def test_key_depends_on_chunk_size_and_version():
+    keys = {
+        ChunkResultStore.key("text", 5000, "1"),
+        ChunkResultStore.key("text", 2000, "1"),
+        ChunkResultStore.key("text", 5000, "2"),
+    }
+    assert len(keys) == 3
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    store = ChunkResultStore(str(tmp_path / "chunks.sqlite3"), max_documents=2)
+    for document in ["a", "b"]:
+        store.save(document, 1, {"document": document})
+        time.sleep(0.01)
+    # Reading a marks it as used, so b is the oldest
+    store.results("a")
+    time.sleep(0.01)
+    store.save("c", 1, {"document": "c"})
+    store.results("c")
+
+    assert store.results("b") == {}
+    assert store.results("a") == {1: {"document": "a"}}
+    assert store.summary()["documents"] == 2
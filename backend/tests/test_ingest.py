@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+import app.ingest as ingest
+from app.clients.extract_case_type import CaseAnalysisResponse
+from app.clients.extract_other_types import CHUNK_SIZE
+from app.clients.llm import llm_client
+from app.db.database import UPLOADS_DIR, get_case_by_id
+from app.db.jobs import DONE, JobQueue
+
+
+class StubLLM:
+    """Chat completions endpoint answering for the chunk a prompt ends with"""
+
+    def __init__(self, bad_answers: int):
+        # Number of calls for the second chunk that get no JSON back
+        self.bad_answers = bad_answers
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][1]["content"]
+        letter = prompt.rstrip()[-1]
+        with self._lock:
+            self.calls += 1
+            bad = letter == "b" and self.bad_answers > 0
+            if bad:
+                self.bad_answers -= 1
+        # Only the second chunk names the affected part
+        fields = {"Affected_Part": "Airbag"} if letter == "b" else {"Affected_Car": "X5"}
+        content = "not JSON" if bad else json.dumps(fields)
+        return httpx.Response(
+            200,
+            json={"choices": [{"message": {"content": content}}], "usage": {"total_tokens": 100}},
+        )
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stub the LLM endpoint and count the calls of the other pipeline steps"""
+    calls = {"case_type": 0, "embed": 0, "similar": 0, "prediction": 0}
+
+    def count(step, result=lambda case: case):
+        def stub(case, **kwargs):
+            calls[step] += 1
+            return result(case)
+        return stub
+
+    case_type = CaseAnalysisResponse(
+        primary_analysis={"case_type": "PL", "harm_type": "h", "cause": "c", "description": "d"}
+    )
+    monkeypatch.setattr(ingest, "extract_case_type", count("case_type", lambda text: case_type))
+    monkeypatch.setattr(ingest, "embed", count("embed"))
+    monkeypatch.setattr(ingest, "find_similar", count("similar"))
+    monkeypatch.setattr(ingest, "add_win_likelihood_to_case", count("prediction"))
+
+    def run(case_id, bad_answers, tmp_path, max_attempts=3):
+        llm = StubLLM(bad_answers)
+        monkeypatch.setattr(llm_client, "_client", httpx.Client(transport=httpx.MockTransport(llm)))
+        spool_dir = os.path.join(UPLOADS_DIR, case_id)
+        os.makedirs(spool_dir)
+        path = os.path.join(spool_dir, "0_doc.txt")
+        with open(path, "w") as f:
+            # Two chunks, the second one ends in "b"; the case ID keeps documents apart
+            f.write(case_id.ljust(CHUNK_SIZE, "a") + "b" * 100)
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=max_attempts)
+        job = queue.enqueue(case_id, {"dir": spool_dir, "files": [{"path": path, "filename": "doc.txt"}]})
+        workers = ingest.IngestionWorkers(queue)
+        workers.start()
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                jobs = [queue.get(row[0]) for row in queue._conn.execute("SELECT id FROM jobs")]
+                if len(jobs) == 2 and all(j["status"] == DONE for j in jobs):
+                    break
+                time.sleep(0.05)
+        finally:
+            workers.stop()
+        completion = next(j for j in jobs if j["id"] != job["id"])
+        return queue.get(job["id"]), completion, llm, spool_dir
+
+    return run, calls
+
+
+def test_failed_chunk_is_completed_without_rerunning_the_pipeline(pipeline, tmp_path):
+    run, calls = pipeline
+    # The second chunk fails in the first run and its salvage pass
+    job, completion, llm, spool_dir = run("CASE-RETRY", 2, tmp_path)
+
+    assert job["status"] == DONE
+    assert "extracted again" in job["error"]
+    assert completion["status"] == DONE
+    assert completion["error"] is None
+    assert completion["attempts"] == 1
+    # First chunk once, second chunk twice, then once in the completion job
+    assert llm.calls == 4
+    assert calls == {"case_type": 1, "embed": 2, "similar": 1, "prediction": 1}
+    case = get_case_by_id("CASE-RETRY")
+    assert case["caseType"] == "PL"
+    assert case["affectedCar"] == "X5"
+    assert case["affectedPart"] == "Airbag"
+    assert not os.path.exists(spool_dir)
+
+
+def test_spool_is_removed_when_completion_runs_out_of_attempts(pipeline, tmp_path):
+    run, calls = pipeline
+    job, completion, llm, spool_dir = run("CASE-GIVE-UP", 100, tmp_path, max_attempts=2)
+
+    assert job["status"] == DONE
+    assert completion["status"] == DONE
+    assert completion["attempts"] == 2
+    assert "could not be extracted" in completion["error"]
+    assert calls["case_type"] == 1
+    assert not os.path.exists(spool_dir)
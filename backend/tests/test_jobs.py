@@ -0,0 +1,96 @@
+import time
+
+from app.db.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_claim_returns_jobs_in_order(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    first = queue.enqueue("C1", {"n": 1})
+    second = queue.enqueue("C2", {"n": 2})
+
+    claimed = queue.claim(timeout=0)
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    assert queue.claim(timeout=0)["id"] == second["id"]
+    assert queue.claim(timeout=0) is None
+
+
+def test_delayed_job_is_not_claimed_early(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job = queue.enqueue("C1", {}, delay=0.3)
+
+    assert queue.claim(timeout=0) is None
+    claimed = queue.claim(timeout=2)
+    assert claimed["id"] == job["id"]
+
+
+def test_retry_until_out_of_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    job = queue.enqueue("C1", {})
+
+    queue.claim(timeout=0)
+    assert queue.retry(job["id"], "chunks failed", delay=0)
+    retried = queue.get(job["id"])
+    assert retried["status"] == QUEUED
+    assert retried["error"] == "chunks failed"
+
+    assert queue.claim(timeout=0)["attempts"] == 2
+    assert not queue.retry(job["id"], "chunks failed", delay=0)
+    assert queue.get(job["id"])["status"] == RUNNING
+
+
+def test_finish_keeps_a_warning(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job = queue.enqueue("C1", {})
+    queue.claim(timeout=0)
+    queue.finish(job["id"], error="some chunks failed")
+
+    finished = queue.get(job["id"])
+    assert finished["status"] == DONE
+    assert finished["progress"] == 1.0
+    assert finished["error"] == "some chunks failed"
+
+
+def test_recover_requeues_abandoned_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    job = queue.enqueue("C1", {})
+    queue.claim(timeout=0)
+
+    # A new process finds the job left running without a fresh heartbeat
+    assert JobQueue(path, stale_after=0).recover() == [job["id"]]
+    assert queue.get(job["id"])["status"] == QUEUED
+
+
+def test_recover_leaves_jobs_of_live_processes(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    running = JobQueue(path, stale_after=0.3)
+    job = running.enqueue("C1", {})
+    running.claim(timeout=0)
+
+    # Another process starting up while the first one is still beating
+    other = JobQueue(path, stale_after=0.3)
+    assert other.recover() == []
+    time.sleep(0.2)
+    running.heartbeat()
+    time.sleep(0.2)
+    assert other.recover() == []
+    assert other.get(job["id"])["status"] == RUNNING
+
+    # The first process stops beating
+    time.sleep(0.4)
+    assert other.recover() == [job["id"]]
+    assert other.claim(timeout=0)["attempts"] == 2
+
+
+def test_recover_fails_jobs_out_of_attempts(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, max_attempts=1, stale_after=0)
+    job = queue.enqueue("C1", {})
+    queue.claim(timeout=0)
+
+    assert queue.recover() == []
+    failed = queue.get(job["id"])
+    assert failed["status"] == FAILED
+    assert failed["error"] == "Interrupted too many times"
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.clients.llm import LLMClient, estimate_tokens, message_content
+from app.clients.rate_limit import RateLimiter
+
+REQUEST = {"messages": [{"role": "user", "content": "Hello"}], "max_tokens": 10}
+
+
+def completion(content: str = "Hi", tokens: int = 12) -> dict:
+    return {"choices": [{"message": {"content": content}}], "usage": {"total_tokens": tokens}}
+
+
+def limiter(max_concurrency: int = 4) -> RateLimiter:
+    return RateLimiter(
+        requests_per_minute=6000,
+        tokens_per_minute=1_000_000,
+        max_concurrency=max_concurrency,
+        initial_concurrency=max_concurrency,
+    )
+
+
+def client(handler, **kwargs) -> LLMClient:
+    kwargs.setdefault("limiter", limiter())
+    return LLMClient(
+        endpoint="http://llm.test/chat",
+        api_key="test-key",
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+def run_async(coroutine):
+    """
+    Run a coroutine on a new event loop
+
+    Unlike asyncio.run, closing the loop does not wait for executor threads,
+    so a thread stuck waiting for the limiter fails a test instead of hanging it.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_chat_posts_to_the_endpoint():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=completion())
+
+    llm = client(handler)
+    result = llm.chat(REQUEST)
+
+    assert message_content(result) == "Hi"
+    assert seen[0].url == "http://llm.test/chat"
+    assert seen[0].headers["api-key"] == "test-key"
+    assert json.loads(seen[0].content) == REQUEST
+    assert llm.metrics.snapshot()["tokensUsed"] == 12
+    assert llm.limiter.in_flight == 0
+
+
+def test_transient_errors_are_retried():
+    statuses = iter([503, 429, 200])
+
+    def handler(request):
+        status = next(statuses)
+        if status == 429:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(status, json=completion() if status == 200 else {})
+
+    llm = client(handler, max_retries=3)
+    assert message_content(llm.chat(REQUEST)) == "Hi"
+
+    metrics = llm.metrics.snapshot()
+    assert metrics["attempts"] == 3
+    assert metrics["retries"] == 2
+    assert metrics["failed"] == 0
+    assert llm.limiter.throttled == 1
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad request"})
+
+    llm = client(handler, max_retries=3)
+    with pytest.raises(httpx.HTTPStatusError):
+        llm.chat(REQUEST)
+    assert len(calls) == 1
+    assert llm.metrics.snapshot()["failed"] == 1
+    assert llm.limiter.in_flight == 0
+
+
+def test_missing_configuration_is_an_error(monkeypatch):
+    monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+    monkeypatch.delenv("AZURE_OPENAI_API_KEY", raising=False)
+    llm = LLMClient(limiter=limiter())
+    assert not llm.configured
+    with pytest.raises(ValueError):
+        llm.chat(REQUEST)
+
+
+def test_achat():
+    llm = client(lambda request: httpx.Response(200, json=completion("async")))
+
+    async def run():
+        try:
+            return await llm.achat(REQUEST)
+        finally:
+            await llm.aclose()
+
+    assert message_content(run_async(run())) == "async"
+    assert llm.limiter.in_flight == 0
+
+
+def test_cancelled_achat_gives_its_limiter_slot_back():
+    llm = client(lambda request: httpx.Response(200, json=completion()), limiter=limiter(1))
+    tokens = estimate_tokens(REQUEST)
+
+    async def run():
+        # Hold the only slot, so achat waits for it
+        llm.limiter.acquire(tokens)
+        task = asyncio.create_task(llm.achat(REQUEST))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The waiting thread now gets the slot and must hand it back
+        llm.limiter.release(tokens, used_tokens=0)
+        await asyncio.sleep(0.2)
+        assert llm.limiter.in_flight == 0
+        result = await asyncio.wait_for(llm.achat(REQUEST), timeout=2)
+        await llm.aclose()
+        return result
+
+    assert message_content(run_async(run())) == "Hi"
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import app.db.database as database
+import app.middleware as middleware
+from app.db.ann import IVFIndex
+from app.db.embeddings import EmbeddingMatrix
+from app.middleware import CompressionMiddleware, ETagMiddleware
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """A small API behind both middlewares, with a data version the test controls"""
+    state = {"version": "v1", "calls": 0}
+    monkeypatch.setattr(middleware, "get_data_version", lambda: state["version"])
+
+    app = FastAPI()
+    app.add_middleware(ETagMiddleware, prefixes=["/api/cases"])
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/api/cases/{case_id}")
+    def get_case(case_id: str):
+        state["calls"] += 1
+        if case_id == "missing":
+            raise HTTPException(status_code=404, detail="Case not found")
+        return {"id": case_id, "summary": "text " * 100}
+
+    return TestClient(app), state
+
+
+def test_matching_etag_is_answered_without_running_the_route(api):
+    client, state = api
+    first = client.get("/api/cases/C1", headers={"Accept-Encoding": "identity"})
+    assert first.headers["etag"] == '"v1"'
+
+    second = client.get("/api/cases/C1", headers={"If-None-Match": '"v1"'})
+    assert second.status_code == 304
+    assert state["calls"] == 1
+
+    state["version"] = "v2"
+    third = client.get(
+        "/api/cases/C1", headers={"Accept-Encoding": "identity", "If-None-Match": '"v1"'}
+    )
+    assert third.status_code == 200
+    assert third.headers["etag"] == '"v2"'
+
+
+def test_compressed_variant_has_its_own_etag(api):
+    client, _ = api
+    response = client.get("/api/cases/C1", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"v1+gzip"'
+    assert response.json()["id"] == "C1"
+
+    revalidated = client.get(
+        "/api/cases/C1", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v1+gzip"'}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == '"v1+gzip"'
+
+
+def test_wildcard_only_matches_existing_resources(api):
+    client, _ = api
+    missing = client.get("/api/cases/missing", headers={"If-None-Match": "*"})
+    assert missing.status_code == 404
+
+    existing = client.get("/api/cases/C1", headers={"If-None-Match": "*"})
+    assert existing.status_code == 304
+
+
+def test_data_version_changes_when_the_similarity_index_is_rebuilt(tmp_path, monkeypatch):
+    embeddings = EmbeddingMatrix(str(tmp_path / "embeddings.npy"))
+    rng = np.random.default_rng(0)
+    embeddings.put_many((f"C{i}", rng.normal(size=8)) for i in range(50))
+    index = IVFIndex(embeddings, str(tmp_path / "embeddings.ivf.npz"), min_rows=10)
+    monkeypatch.setattr(database, "_similarity_index", index)
+
+    before = database.get_data_version()
+    assert database.get_data_version() == before
+    index.build()
+    assert database.get_data_version() != before
+
+    # A rebuild by another process, e.g. scripts/reembed.py
+    built = database.get_data_version()
+    IVFIndex(embeddings, index.path, min_rows=10).build(seed=1)
+    assert database.get_data_version() != built
@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.clients.rate_limit import RateLimiter, TokenBucket, parse_retry_after
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    bucket.take(60)
+    assert bucket.wait_time(1, now) > 0
+    assert bucket.wait_time(1, now + 1.0) == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({}) is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after({"retry-after": later}) <= 30
+
+
+def test_concurrency_increases_on_success_and_halves_on_429():
+    limiter = RateLimiter(
+        requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=8, initial_concurrency=4
+    )
+    for _ in range(8):
+        limiter.acquire(10)
+        limiter.release(10, used_tokens=10)
+    assert limiter.snapshot()["concurrency"] == 5
+
+    limiter.acquire(10)
+    limiter.release(10, succeeded=False, throttled=True, retry_after=0.2)
+    snapshot = limiter.snapshot()
+    assert snapshot["concurrency"] == 2
+    assert snapshot["throttled"] == 1
+    assert snapshot["pausedFor"] > 0
+
+    # Requests wait out the pause
+    start = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - start >= 0.1
+    limiter.release(10, used_tokens=10)
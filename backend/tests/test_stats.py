@@ -0,0 +1,61 @@
+from app.db.dimensions import DimensionTable
+from app.db.stats import BitmapIndexView, TimeSeriesView
+
+CASES = {
+    "C1": {"date": "2023-01-15", "affectedCar": "X5", "affectedPart": "Airbag", "status": "Settled", "stateJurisdiction": "California"},
+    "C2": {"date": "2023-02-01", "affectedCar": "X5", "affectedPart": "Brakes", "status": "In Progress appeal", "stateJurisdiction": "Texas"},
+    "C3": {"date": "2023-04-20", "affectedCar": "i3", "affectedPart": "Airbag", "status": "In Progress first instance", "stateJurisdiction": "California"},
+    "C4": {"date": "2024-01-03", "affectedCar": "X5", "affectedPart": "Airbag", "status": "Settled", "stateJurisdiction": "California"},
+    "C5": {"date": "Not specified", "affectedCar": "X5", "affectedPart": "Airbag", "status": "Settled"},
+}
+
+
+def views():
+    dimensions = DimensionTable()
+    timeseries = TimeSeriesView(dimensions)
+    bitmaps = BitmapIndexView(dimensions)
+    timeseries.reset(CASES)
+    bitmaps.reset(CASES)
+    return timeseries, bitmaps
+
+
+def test_unfiltered_bitmap_series_matches_the_time_series_view():
+    timeseries, bitmaps = views()
+    for field in ["affectedPart", "affectedCar", "status"]:
+        for bucket in ["month", "quarter", "year"]:
+            assert bitmaps.series(field, bitmaps.mask({}), bucket) == timeseries.series(field, bucket)
+
+
+def test_filtered_series():
+    _, bitmaps = views()
+    mask = bitmaps.mask({"affectedCar": "X5", "stateJurisdiction": "California"})
+    assert bitmaps.series("affectedPart", mask, "quarter") == (
+        ["2023-Q1", "2023-Q2", "2023-Q3", "2023-Q4", "2024-Q1"],
+        {"Airbag": [1, 0, 0, 0, 1]},
+    )
+
+    in_2023 = bitmaps.mask({}, date_from="2023-01-01", date_to="2023-12-31")
+    labels, series = bitmaps.series("status", in_2023, "year")
+    assert labels == ["2023"]
+    assert series == {"Settled": [1], "In Progress": [2]}
+
+    assert bitmaps.series("status", bitmaps.mask({"affectedCar": "Z4"})) == ([], {})
+
+
+def test_new_cases_are_stored_with_canonical_car_and_part():
+    from app.db.database import add_new_case, get_car_stats, get_case_by_id, get_part_stats
+
+    def counts():
+        cars = {row["model"]: row["count"] for row in get_car_stats()}
+        parts = {row["part"]: row["count"] for row in get_part_stats()}
+        return cars.get("X5", 0), parts.get("Airbag", 0)
+
+    before = counts()
+    assert add_new_case(
+        "CANON1",
+        {"id": "CANON1", "affectedCar": "2019 BMW X5 SUV", "affectedPart": "front airbags", "status": "Settled"},
+    )
+    stored = get_case_by_id("CANON1")
+    assert stored["affectedCar"] == "X5"
+    assert stored["affectedPart"] == "Airbag"
+    assert counts() == (before[0] + 1, before[1] + 1)
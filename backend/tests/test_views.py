@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from app.db.database import add_new_case, list_cases
+from app.db.views import SortedIndexView, SummaryView
+
+
+def make_cases(count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        f"C{i:03d}": {
+            "id": f"C{i:03d}",
+            "date": f"202{rng.randint(0, 4)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "status": rng.choice(["Settled", "Dismissed", "In Progress appeal", None]),
+            "caseType": rng.choice(["Product Liability", "Warranty"]),
+        }
+        for i in range(count)
+    }
+
+
+def test_summary_slice_follows_store_order():
+    view = SummaryView()
+    view.reset(make_cases(5))
+    view.upsert("C002", make_cases(5)["C002"], {"id": "C002", "title": "changed"})
+    view.upsert("NEW", None, {"id": "NEW"})
+    view.remove("C000", make_cases(5)["C000"])
+
+    assert [case["id"] for case in view.slice(0, None)] == ["C001", "C002", "C003", "C004", "NEW"]
+    assert [case["id"] for case in view.slice(3, 10)] == ["C004", "NEW"]
+    assert view.get("C002")["title"] == "changed"
+    assert len(view) == 5
+
+
+def brute_force(cases, subset, field, descending):
+    ordered = sorted((SortedIndexView.sort_key(cases[i], field), i) for i in subset)
+    if descending:
+        ordered.reverse()
+    return [case_id for _, case_id in ordered]
+
+
+@pytest.mark.parametrize("subset_size", [3, 60, 200])
+@pytest.mark.parametrize("descending", [False, True])
+def test_page_of_subset_matches_a_full_sort(subset_size, descending):
+    cases = make_cases(200)
+    view = SortedIndexView(["date", "status"])
+    view.reset(cases)
+    subset = set(random.Random(subset_size).sample(sorted(cases), subset_size))
+
+    for field in ["date", "status"]:
+        expected = brute_force(cases, subset, field, descending)
+        assert view.page_of(field, subset, descending, 0, None) == expected
+        assert view.page_of(field, subset, descending, 2, 5) == expected[2:7]
+
+
+def test_sorted_index_follows_updates():
+    cases = make_cases(20)
+    view = SortedIndexView(["date"])
+    view.reset(cases)
+    updated = dict(cases["C005"], date="1999-01-01")
+    view.upsert("C005", cases["C005"], updated)
+    cases["C005"] = updated
+    view.remove("C007", cases.pop("C007"))
+
+    assert view.page("date", False, 0, 1) == ["C005"]
+    assert view.page("date", False, 0, None) == brute_force(cases, cases, "date", False)
+    assert view.page("date", True, 0, None) == brute_force(cases, cases, "date", True)
+
+
+def test_list_cases_pages_search_matches_in_sort_order():
+    for i, date in enumerate(["2021-05-01", "2020-01-01", "2023-03-03", "2022-02-02"]):
+        add_new_case(f"SORT-{i}", {"id": f"SORT-{i}", "title": f"zyxwv case {i}", "date": date})
+
+    page, total = list_cases(search="zyxwv", sort="date", descending=True, offset=1, limit=2)
+    assert total == 4
+    assert [case["id"] for case in page] == ["SORT-3", "SORT-0"]
@@ -10,7 +10,7 @@ import { TopNavigation } from '@/components/top-navigation';
 import { Timeline } from '@/components/timeline';
 import { ArgumentationSection } from '@/components/argumentation-section';
 import { OutcomePrediction } from '@/components/outcome-prediction';
-import { fetchCaseById } from '@/lib/api';
+import { fetchCaseById, fetchSimilar } from '@/lib/api';
 
 type CaseStatus =
     | 'in favour of defendant'
@@ -69,6 +69,9 @@ export default function CaseDetailPage({
     const { id: caseId } = React.use(params);
 
     const [caseData, setCaseData] = useState<any>(null);
+    const [similarCases, setSimilarCases] = useState<
+        { id: string; score: number }[]
+    >([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
@@ -76,9 +79,14 @@ export default function CaseDetailPage({
         async function loadCase() {
             setLoading(true);
             try {
-                const data = await fetchCaseById(caseId);
+                // Similar cases are computed against the current corpus
+                const [data, similar] = await Promise.all([
+                    fetchCaseById(caseId),
+                    fetchSimilar(caseId),
+                ]);
                 if (data) {
                     setCaseData(data);
+                    setSimilarCases(similar);
                 } else {
                     setError('Case not found');
                 }
@@ -640,21 +648,22 @@ export default function CaseDetailPage({
                             <CardTitle>Case Law</CardTitle>
                         </CardHeader>
                         <CardContent>
-                            {caseData.similarCases &&
-                            caseData.similarCases.length > 0 ? (
+                            {similarCases.length > 0 ? (
                                 <ul className='list-disc pl-5 space-y-1'>
-                                    {caseData.similarCases.map(
-                                        (related: any, idx: number) => (
-                                            <li key={idx} className='text-sm'>
-                                                <Link
-                                                    href={`/cases/${related}`}
-                                                    className='text-blue-600 hover:underline'
-                                                >
-                                                    {related}
-                                                </Link>
-                                            </li>
-                                        )
-                                    )}
+                                    {similarCases.map((related) => (
+                                        <li key={related.id} className='text-sm'>
+                                            <Link
+                                                href={`/cases/${related.id}`}
+                                                className='text-blue-600 hover:underline'
+                                            >
+                                                {related.id}
+                                            </Link>{' '}
+                                            <span className='text-muted-foreground'>
+                                                ({Math.round(related.score * 100)}%
+                                                similar)
+                                            </span>
+                                        </li>
+                                    ))}
                                 </ul>
                             ) : (
                                 <p className='text-sm text-muted-foreground'>
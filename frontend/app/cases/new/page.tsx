@@ -10,7 +10,7 @@ import { Input } from '@/components/ui/input';
 import { ArrowLeft, Upload, Loader2 } from 'lucide-react';
 import Link from 'next/link';
 import { TopNavigation } from '@/components/top-navigation';
-import { createCase } from '@/lib/api';
+import { createCase, fetchJob } from '@/lib/api';
 import { Progress } from '@/components/ui/progress';
 
 export default function NewCasePage() {
@@ -51,46 +51,32 @@ export default function NewCasePage() {
         setIsSubmitting(true);
         setProgress(0);
 
-        let progressValue = 0;
-        let progressInterval: NodeJS.Timeout | null = null;
-        let requestFinished = false;
-
-        // Start progress bar animation
-        progressInterval = setInterval(() => {
-            // Increase by 4 every 1000ms (1 second)
-            // This will take ~25 seconds to reach 100%
-            progressValue += 4;
-
-            if (progressValue >= 95) {
-                // Cap at 95% until the request is complete
-                progressValue = 95;
-                setProgress(progressValue);
-
-                // If request already finished, jump to 100%
-                if (requestFinished) {
-                    progressValue = 100;
-                    setProgress(100);
-                    if (progressInterval) clearInterval(progressInterval);
-                }
-            } else {
-                setProgress(progressValue);
-            }
-        }, 1000); // 1 second interval
-
         try {
             const formData = new FormData();
             files.forEach((file) => {
                 formData.append('files', file);
             });
+            // The case is created by a background job, poll it until done
             const response = await createCase(formData);
-            requestFinished = true;
-            setProgress(100);
-            if (progressInterval) clearInterval(progressInterval);
+            while (true) {
+                const job = await fetchJob(response.jobId);
+                setProgress(Math.round(job.progress * 100));
+                if (job.status === 'done') {
+                    // Chunks that could not be extracted are retried in the background
+                    if (job.error) {
+                        console.warn('Case created with warnings:', job.error);
+                    }
+                    break;
+                }
+                if (job.status === 'failed') {
+                    throw new Error(job.error || 'Case ingestion failed');
+                }
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+            }
             router.push(`/cases/${response.id}`);
         } catch (error) {
             setIsSubmitting(false);
             setProgress(0);
-            if (progressInterval) clearInterval(progressInterval);
             console.error('Error creating case:', error);
             alert('Failed to create case. Please try again.');
         }
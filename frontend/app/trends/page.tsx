@@ -7,19 +7,21 @@ import { CarChart } from "@/components/charts/car-chart"
 import { PartChart } from "@/components/charts/part-chart"
 import { CaseStatusChart } from "@/components/charts/case-status-chart"
 import { TopNavigation } from "@/components/top-navigation"
-import { fetchTrendStats } from "@/lib/api"
+import { fetchDashboard } from "@/lib/api"
 
 export default function TrendsPage() {
   const [stats, setStats] = useState<any>(null)
+  const [dashboard, setDashboard] = useState<any>(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
     async function loadStats() {
       setLoading(true)
       try {
-        const data = await fetchTrendStats()
+        const data = await fetchDashboard()
         if (data) {
-          setStats(data)
+          setDashboard(data)
+          setStats(data.stats)
         }
       } catch (error) {
         console.error("Error loading trend stats:", error)
@@ -93,7 +95,7 @@ export default function TrendsPage() {
                     <CardDescription>Distribution of case results</CardDescription>
                   </CardHeader>
                   <CardContent className="h-80">
-                    <CaseStatusChart />
+                    <CaseStatusChart data={dashboard.status} />
                   </CardContent>
                 </Card>
 
@@ -103,7 +105,7 @@ export default function TrendsPage() {
                     <CardDescription>Distribution by car model</CardDescription>
                   </CardHeader>
                   <CardContent className="h-80">
-                    <CarChart />
+                    <CarChart data={dashboard.cars} />
                   </CardContent>
                 </Card>
               </div>
@@ -114,7 +116,7 @@ export default function TrendsPage() {
                   <CardDescription>Distribution by car part</CardDescription>
                 </CardHeader>
                 <CardContent className="h-80">
-                  <PartChart />
+                  <PartChart data={dashboard.parts} />
                 </CardContent>
               </Card>
             </TabsContent>
@@ -126,7 +128,7 @@ export default function TrendsPage() {
                   <CardDescription>Detailed breakdown by car model</CardDescription>
                 </CardHeader>
                 <CardContent className="h-96">
-                  <CarChart />
+                  <CarChart data={dashboard.cars} />
                 </CardContent>
               </Card>
             </TabsContent>
@@ -138,7 +140,7 @@ export default function TrendsPage() {
                   <CardDescription>Detailed breakdown by car part</CardDescription>
                 </CardHeader>
                 <CardContent className="h-96">
-                  <PartChart />
+                  <PartChart data={dashboard.parts} />
                 </CardContent>
               </Card>
             </TabsContent>
@@ -150,7 +152,7 @@ export default function TrendsPage() {
                   <CardDescription>Detailed breakdown of case results</CardDescription>
                 </CardHeader>
                 <CardContent className="h-96">
-                  <CaseStatusChart />
+                  <CaseStatusChart data={dashboard.status} />
                 </CardContent>
               </Card>
             </TabsContent>
@@ -13,17 +13,23 @@ import { fetchCarStats } from '@/lib/api';
 
 const COLORS = ['#3b82f6', '#8b5cf6', '#ec4899', '#f97316', '#10b981'];
 
-export function CarChart() {
+// Renders the given data, or fetches it when no data is passed
+export function CarChart({ data }: { data?: any[] } = {}) {
     const [carData, setCarData] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         async function loadCarData() {
+            if (data) {
+                setCarData(data);
+                setLoading(false);
+                return;
+            }
             setLoading(true);
             try {
-                const data = await fetchCarStats();
-                if (data && data.length > 0) {
-                    setCarData(data);
+                const fetched = await fetchCarStats();
+                if (fetched && fetched.length > 0) {
+                    setCarData(fetched);
                 }
             } catch (error) {
                 console.error('Error loading car stats:', error);
@@ -33,7 +39,7 @@ export function CarChart() {
         }
 
         loadCarData();
-    }, []);
+    }, [data]);
 
     if (loading) {
         return (
@@ -23,17 +23,23 @@ const STATUS_COLORS: Record<string, string> = {
     'In progress': '#2563eb', // standard blue
 };
 
-export function CaseStatusChart() {
+// Renders the given data, or fetches it when no data is passed
+export function CaseStatusChart({ data }: { data?: any[] } = {}) {
     const [statusData, setStatusData] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         async function loadStatusData() {
+            if (data) {
+                setStatusData(data);
+                setLoading(false);
+                return;
+            }
             setLoading(true);
             try {
-                const data = await fetchStatusStats();
-                if (data && data.length > 0) {
-                    setStatusData(data);
+                const fetched = await fetchStatusStats();
+                if (fetched && fetched.length > 0) {
+                    setStatusData(fetched);
                 }
             } catch (error) {
                 console.error('Error loading status stats:', error);
@@ -43,7 +49,7 @@ export function CaseStatusChart() {
         }
 
         loadStatusData();
-    }, []);
+    }, [data]);
 
     if (loading) {
         return (
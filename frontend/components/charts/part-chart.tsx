@@ -11,17 +11,23 @@ import {
 } from 'recharts';
 import { fetchPartStats } from '@/lib/api';
 
-export function PartChart() {
+// Renders the given data, or fetches it when no data is passed
+export function PartChart({ data }: { data?: any[] } = {}) {
     const [partData, setPartData] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         async function loadPartData() {
+            if (data) {
+                setPartData(data);
+                setLoading(false);
+                return;
+            }
             setLoading(true);
             try {
-                const data = await fetchPartStats();
-                if (data && data.length > 0) {
-                    setPartData(data);
+                const fetched = await fetchPartStats();
+                if (fetched && fetched.length > 0) {
+                    setPartData(fetched);
                 }
             } catch (error) {
                 console.error('Error loading part stats:', error);
@@ -31,7 +37,7 @@ export function PartChart() {
         }
 
         loadPartData();
-    }, []);
+    }, [data]);
 
     if (loading) {
         return (
@@ -36,6 +36,24 @@ export async function fetchCaseById(id: string) {
     }
 }
 
+export async function fetchSimilar(id: string, k = 5) {
+    try {
+        const params = new URLSearchParams({ k: String(k) });
+        const response = await fetch(
+            `${API_BASE_URL}/cases/${id}/similar?${params}`
+        );
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error(`Error fetching cases similar to ${id}:`, error);
+        return [];
+    }
+}
+
 export async function fetchTrendStats() {
     try {
         const response = await fetch(`${API_BASE_URL}/stats/`);
@@ -51,6 +69,37 @@ export async function fetchTrendStats() {
     }
 }
 
+export async function fetchDashboard() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/stats/dashboard`);
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching dashboard stats:', error);
+        return null;
+    }
+}
+
+export async function fetchTimeSeries(bucket = 'month', groupBy = 'affectedPart') {
+    try {
+        const params = new URLSearchParams({ bucket, group_by: groupBy });
+        const response = await fetch(`${API_BASE_URL}/stats/timeseries?${params}`);
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching time series stats:', error);
+        return null;
+    }
+}
+
 export async function fetchCarStats() {
     try {
         const response = await fetch(`${API_BASE_URL}/stats/cars`);
@@ -113,3 +162,13 @@ export async function createCase(formData: FormData) {
         throw error;
     }
 }
+
+export async function fetchJob(jobId: string) {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+
+    if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+
+    return await response.json();
+}